@@ -0,0 +1,2554 @@
+"""Motor del auditor: configuración de tiendas, scraping, cache/checkpoints/historial y exportación.
+
+No depende de Streamlit, así que se puede usar desde cron o un worker. Playwright, aiohttp y openpyxl
+se importan recién cuando se usan. Línea de comandos:
+
+    python auditor.py maestro.xlsx --tienda ICBC --umbral 5 --salida reporte.xlsx
+"""
+import argparse
+import importlib.util
+import pandas as pd
+import numpy as np
+from datetime import datetime
+from io import BytesIO
+import time
+import requests
+from bs4 import BeautifulSoup, UnicodeDammit
+import re
+import os
+import sys
+import json
+import html
+import hashlib
+import logging
+import sqlite3
+import threading
+import queue
+import asyncio
+import multiprocessing
+from contextlib import contextmanager, nullcontext
+from urllib.parse import urlparse, urlsplit, urlunsplit, parse_qsl, urlencode
+from email.utils import parsedate_to_datetime
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, Future, as_completed, wait, FIRST_COMPLETED
+
+try:
+    import lxml.html
+    from lxml import etree
+    from lxml.cssselect import CSSSelector
+    LXML_AVAILABLE = True
+except ImportError:
+    LXML_AVAILABLE = False
+
+# Dependencias pesadas: solo se chequea que estén; el import real se hace al usarlas
+PLAYWRIGHT_AVAILABLE = importlib.util.find_spec('playwright') is not None
+AIOHTTP_AVAILABLE = importlib.util.find_spec('aiohttp') is not None
+OPENPYXL_AVAILABLE = importlib.util.find_spec('openpyxl') is not None
+PARQUET_AVAILABLE = importlib.util.find_spec('pyarrow') is not None
+# Lector de Excel en Rust: el mismo resultado que openpyxl, varias veces más rápido en maestros grandes
+CALAMINE_AVAILABLE = importlib.util.find_spec('python_calamine') is not None
+
+logger = logging.getLogger("auditor")
+
+# lectura_parcial (opcional, por tienda): selector CSS del bloque del producto. Con él, la descarga se corta
+# cuando ese bloque y los selectores de precio ya cerraron; el bloque tiene que contener también el aviso de
+# "no disponible", porque lo que venga después no se lee. Sin la clave se lee la página entera.
+TIENDAS_CONFIG = {
+    "ICBC": {
+        "columnas_busqueda": ["ICBC", "icbc"],
+        "max_conexiones_host": 16,
+        "selector_titulo": "h1[itemprop='name']",
+        "selector_precio": "p.monto",
+        "selector_precio_tachado": "p.precio-anterior",
+        "selector_descuento": "p.descuento",
+        "selector_categoria": "span.breadcrumb-span[itemprop='title']"
+    },
+    "Supervielle": {
+        "columnas_busqueda": ["Supervielle", "supervielle"],
+        "max_conexiones_host": 16,
+        "selector_titulo": "h1[itemprop='name']",
+        "selector_precio": "span#our_price_display",
+        "selector_precio_tachado": "span.price",
+        "selector_descuento": "span#reduction_percent_display",
+        "selector_categoria": "span[itemprop='title']"
+    },
+    "Galicia": {
+        "columnas_busqueda": ["Galicia", "galicia"],
+        "max_conexiones_host": 16,
+        "selector_titulo": "h1.productTitle",
+        "selector_precio": "div.productPrice span",
+        "selector_descuento": "span.discount.discount-percentage",
+        "selector_categoria": "span[itemprop='name']"
+    },
+    "Ciudad": {
+        "columnas_busqueda": ["Ciudad", "ciudad"],
+        "max_conexiones_host": 16,
+        "selector_titulo": "h1.name",
+        "selector_precio": "span.amount",
+        "selector_precio_tachado": "div[itemprop='offers'] span.amount",
+        "selector_categoria": "a[href*='/catalog/']"
+    },
+    "Fravega": {
+        "columnas_busqueda": ["Fravega", "fravega", "FVG", "fvg"],
+        "max_conexiones_host": 16,
+        "columnas_cuotas": ["Cuotas FVG", "CSI FVG", "Financiacion Fvg", "Financiación FVG", "cuotas fvg", "csi fvg"],
+        "selector_titulo": "h1[data-test-id='product-title']",
+        "selector_precio": "span.sc-1d9b1d9e-0.sc-faa1a185-3",
+        "selector_precio_tachado": "span.sc-e081bce1-0.sc-faa1a185-4",
+        "selector_descuento": "span.sc-e2aca368-0",
+        "selector_categoria": "span[itemprop='name']",
+        "selector_cuotas_container": "span.sc-3cba7521-10",
+        "selector_boton_compra": "button[data-test-id='product-buy-button']",
+        "urls_visa_master": ["54c0d769ece1b", "d91d7904a8578", "visa", "mastercard"],
+        # Probar primero el HTML del servidor (sin navegador); Playwright solo si faltan datos
+        "http_primero": True,
+        "max_paginas_por_navegador": 200,
+        "max_paginas_concurrentes": 4,
+        # Plazo total por página (navegación + espera de selectores)
+        "timeout_pagina_ms": 15000,
+        "procesos_navegador": None,
+        "min_urls_por_proceso": 100,
+        # Solo se lee texto y el src de las imágenes de cuotas: no hace falta descargar nada de esto
+        "bloqueo_recursos": {
+            "tipos": ["image", "media", "font"],
+            "dominios_bloqueados": [
+                "google-analytics.com", "googletagmanager.com", "doubleclick.net",
+                "googleadservices.com", "facebook.net", "facebook.com", "hotjar.com",
+                "criteo.com", "criteo.net", "tiktok.com", "clarity.ms", "taboola.com"
+            ],
+            "dominios_permitidos": ["fravega.com"]
+        }
+    },
+    "BNA": {
+        "columnas_busqueda": ["BNA", "bna"],
+        "max_conexiones_host": 16,
+        "selector_precio": "span.price"
+    },
+    "Megatone": {
+        "columnas_busqueda": ["Megatone", "megatone", "MGT", "mgt"],
+        "max_conexiones_host": 16,
+        "columnas_cuotas": ["Cuotas MGT", "CSI MGT", "cuotas mgt", "csi mgt"],
+        "selector_precio": "span.price"
+    }
+}
+
+def detectar_columnas_automaticamente(df, tienda):
+    config = TIENDAS_CONFIG[tienda]
+    resultado = {'url': None, 'precio': None, 'sku': None, 'cuotas': None}
+    
+    # Patrones más amplios para detección
+    patrones_url = []
+    patrones_precio = []
+    patrones_cuotas = []
+    
+    for busqueda in config['columnas_busqueda']:
+        patrones_url.extend([f'{busqueda} url', f'url {busqueda}', f'{busqueda} link', f'link {busqueda}'])
+        patrones_precio.extend([f'pvp {busqueda}', f'{busqueda} pvp', f'precio {busqueda}', f'{busqueda} precio'])
+    
+    if 'columnas_cuotas' in config:
+        for busqueda in config['columnas_cuotas']:
+            patrones_cuotas.append(busqueda.lower())
+    
+    for col in df.columns:
+        col_lower = col.lower().strip()
+        
+        if resultado['url'] is None:
+            for patron in patrones_url:
+                if patron.lower() in col_lower:
+                    resultado['url'] = col
+                    break
+        
+        if resultado['precio'] is None:
+            for patron in patrones_precio:
+                if patron.lower() in col_lower:
+                    resultado['precio'] = col
+                    break
+        
+        if resultado['sku'] is None:
+            if any(word in col_lower for word in ['sku', 'codigo', 'código']):
+                resultado['sku'] = col
+        
+        if 'columnas_cuotas' in config and resultado['cuotas'] is None:
+            for patron in patrones_cuotas:
+                if patron in col_lower:
+                    resultado['cuotas'] = col
+                    break
+    
+    return resultado
+
+FORMATOS_MAESTRO = ['xlsx', 'xls', 'csv', 'parquet']
+
+def formato_maestro(nombre):
+    formato = os.path.splitext(str(nombre))[1].lstrip('.').lower()
+    if formato not in FORMATOS_MAESTRO:
+        raise ValueError(f"Formato de maestro no soportado: {nombre} (se aceptan {', '.join(FORMATOS_MAESTRO)})")
+    return formato
+
+def _abrir_maestro(origen):
+    # Bytes (archivo subido) o ruta en disco
+    return BytesIO(origen) if isinstance(origen, (bytes, bytearray)) else origen
+
+def _opciones_csv(origen):
+    """Separador y encoding de un CSV mirando solo el principio (Excel en español exporta con ';' y cp1252)"""
+    fuente = _abrir_maestro(origen)
+    if isinstance(fuente, BytesIO):
+        muestra = fuente.getvalue()[:64 * 1024]
+    else:
+        with open(fuente, 'rb') as f:
+            muestra = f.read(64 * 1024)
+    
+    try:
+        texto = muestra.decode('utf-8-sig')
+        encoding = 'utf-8-sig'
+    except UnicodeDecodeError as e:
+        # El corte de la muestra puede caer a mitad de un carácter: eso no cuenta como otro encoding
+        if e.start < len(muestra) - 3:
+            texto, encoding = muestra.decode('cp1252', errors='replace'), 'cp1252'
+        else:
+            texto, encoding = muestra[:e.start].decode('utf-8-sig'), 'utf-8-sig'
+    
+    primera = texto.splitlines()[0] if texto else ''
+    sep = max([',', ';', '\t', '|'], key=primera.count)
+    return {'sep': sep, 'encoding': encoding}
+
+def leer_encabezado_maestro(origen, nombre=None):
+    """Nombres de columna del maestro sin leer las filas: con eso alcanza para detectar columnas"""
+    formato = formato_maestro(nombre or origen)
+    if formato == 'parquet':
+        import pyarrow.parquet as pq
+        return list(pq.read_schema(_abrir_maestro(origen)).names)
+    if formato == 'csv':
+        return list(pd.read_csv(_abrir_maestro(origen), nrows=0, **_opciones_csv(origen)).columns)
+    # openpyxl/xlrd cortan en la primera fila; calamine carga la hoja entera aunque se pida nrows=0
+    return list(pd.read_excel(_abrir_maestro(origen), nrows=0).columns)
+
+def leer_maestro(origen, nombre=None):
+    """Maestro completo como DataFrame (xlsx/xls, csv o parquet), con calamine para Excel si está instalado"""
+    formato = formato_maestro(nombre or origen)
+    if formato == 'parquet':
+        df = pd.read_parquet(_abrir_maestro(origen))
+        # Mismos tipos que daría read_excel: números sin decimales (y sin vacíos) quedan enteros
+        for col in df.select_dtypes('float').columns:
+            valores = df[col].to_numpy()
+            if np.isfinite(valores).all() and (valores == np.floor(valores)).all():
+                df[col] = df[col].astype('int64')
+        return df
+    if formato == 'csv':
+        # Todo como texto: SKU con ceros adelante y precios con separador de miles quedan como se escribieron
+        return pd.read_csv(_abrir_maestro(origen), dtype=str, **_opciones_csv(origen))
+    return pd.read_excel(_abrir_maestro(origen), engine='calamine' if CALAMINE_AVAILABLE else None)
+
+def limpiar_precio(valor):
+    if pd.isna(valor):
+        return None
+    
+    precio_str = str(valor).replace('$', '').replace(' ', '').strip()
+    
+    if not precio_str:
+        return None
+    
+    if '.' in precio_str and ',' in precio_str:
+        precio_str = precio_str.replace('.', '').replace(',', '.')
+    elif '.' in precio_str:
+        if re.search(r'\.\d{3}', precio_str):
+            precio_str = precio_str.replace('.', '')
+        elif not re.search(r'\.\d{2}$', precio_str):
+            precio_str = precio_str.replace('.', '')
+    elif ',' in precio_str:
+        if re.search(r',\d{2}$', precio_str):
+            precio_str = precio_str.replace(',', '.')
+        else:
+            precio_str = precio_str.replace(',', '')
+    
+    try:
+        valor_float = float(re.sub(r'[^\d.]', '', precio_str))
+        return valor_float if valor_float > 0 else None
+    except:
+        return None
+
+def _limpiar_textos_precio(textos):
+    """limpiar_precio sobre una Series de strings ASCII ya sin '$' ni espacios; cada regla solo toca sus filas"""
+    textos = textos.copy()
+    tiene_punto = textos.str.contains('.', regex=False)
+    tiene_coma = textos.str.contains(',', regex=False)
+    
+    ambos = tiene_punto & tiene_coma
+    textos[ambos] = textos[ambos].str.replace('.', '', regex=False).str.replace(',', '.', regex=False)
+    
+    solo_punto = tiene_punto & ~tiene_coma
+    con_punto = textos[solo_punto]
+    punto_miles = con_punto.str.contains(r'\.\d{3}') | ~con_punto.str.contains(r'\.\d{2}$')
+    textos[punto_miles[punto_miles].index] = con_punto[punto_miles].str.replace('.', '', regex=False)
+    
+    solo_coma = tiene_coma & ~tiene_punto
+    con_coma = textos[solo_coma]
+    coma_decimal = con_coma.str.contains(r',\d{2}$')
+    textos[con_coma.index] = con_coma.str.replace(',', '', regex=False).where(
+        ~coma_decimal, con_coma.str.replace(',', '.', regex=False))
+    
+    textos = textos.str.replace(r'[^\d.]', '', regex=True)
+    # Lo que float() acepta una vez que solo quedan dígitos y puntos
+    validos = textos.str.fullmatch(r'\d*\.?\d*') & textos.str.contains(r'\d')
+    
+    valores = pd.Series(np.nan, index=textos.index)
+    valores[validos] = textos[validos].astype(float)
+    return valores
+
+def _normalizar_floats(valores):
+    """limpiar_precio para un array float sin pasar por str(): solo los casos de 1 o 2 decimales en su repr"""
+    absolutos = np.abs(valores)
+    resultado = np.full(len(valores), np.nan)
+    
+    # Debajo de este tope, valor*100 es un entero exacto y la repr no está en notación científica
+    rango = (absolutos >= 1e-4) & (absolutos < 2 ** 52 / 100)
+    decenas = np.round(absolutos * 10)
+    un_decimal = rango & (decenas / 10 == absolutos)
+    dos_decimales = rango & ~un_decimal & (np.round(absolutos * 100) / 100 == absolutos)
+    
+    # '12345.0' -> '.' sin dos decimales al final -> se borra el punto: 123450 (igual que limpiar_precio)
+    resultado[un_decimal] = decenas[un_decimal]
+    resultado[dos_decimales] = absolutos[dos_decimales]
+    
+    resto = ~(un_decimal | dos_decimales) & ~np.isnan(valores)
+    resultado[resto] = [np.nan if (v := limpiar_precio(x)) is None else v for x in valores[resto].tolist()]
+    return np.where(resultado > 0, resultado, np.nan)
+
+def _normalizar_textos(textos):
+    """limpiar_precio sobre un array de str: cada texto distinto se normaliza una sola vez"""
+    # Los maestros repiten mucho los precios
+    codigos, unicos = pd.factorize(textos)
+    unicos = pd.Series(unicos, dtype=object)
+    try:
+        # Con pyarrow las operaciones .str corren en C en vez de un bucle Python por celda
+        unicos = unicos.astype('string[pyarrow]')
+    except (ImportError, TypeError, ValueError):
+        pass
+    
+    # Fuera de ASCII imprimible (\xa0, \t, dígitos no latinos...) las regex de pandas pueden no coincidir con re
+    raros = unicos.str.contains(r'[^\x20-\x7e]')
+    limpios = pd.Series(np.nan, index=unicos.index)
+    limpios[raros] = unicos[raros].astype(object).map(limpiar_precio).astype(float)
+    
+    # En ASCII imprimible el único blanco es ' ', así que no hace falta strip()
+    unicos = unicos[~raros].str.replace('$', '', regex=False).str.replace(' ', '', regex=False)
+    unicos = unicos[unicos != '']
+    if len(unicos):
+        limpios[unicos.index] = _limpiar_textos_precio(unicos)
+    
+    return limpios.where(limpios > 0).to_numpy()[codigos]
+
+def normalizar_precios(serie):
+    """Versión vectorizada de limpiar_precio para columnas enteras: Series float (NaN donde limpiar_precio da None)"""
+    if pd.api.types.is_bool_dtype(serie):
+        return serie.map(limpiar_precio).astype(float)
+    
+    if pd.api.types.is_integer_dtype(serie):
+        # Enteros: str() no tiene separadores y el signo se descarta
+        valores = serie.astype(float).abs()
+        return valores.where(valores > 0)
+    
+    if pd.api.types.is_float_dtype(serie):
+        return pd.Series(_normalizar_floats(serie.to_numpy(dtype=float, na_value=np.nan)), index=serie.index)
+    
+    if serie.dtype != object and pd.api.types.is_string_dtype(serie):
+        # Columna de texto de pandas (str/string): solo strings y nulos
+        nulos = serie.isna().to_numpy()
+        resultado = np.full(len(serie), np.nan)
+        if not nulos.all():
+            resultado[~nulos] = _normalizar_textos(serie[~nulos])
+        return pd.Series(resultado, index=serie.index)
+    
+    # Columna mixta (típico de Excel: números y textos como "Consultar"): cada tipo por su camino
+    datos = serie.to_numpy(dtype=object)
+    nulos = pd.isna(datos)
+    codigos_tipo, tipos = pd.factorize(pd.Series(datos).map(type))
+    clases = np.array([1 if issubclass(t, float) else 2 if issubclass(t, (int, np.integer)) and not issubclass(t, bool)
+                       else 0 for t in tipos] or [0], dtype=int)[codigos_tipo]
+    floats = ~nulos & (clases == 1)
+    enteros = clases == 2
+    textos = ~(nulos | floats | enteros)
+    
+    resultado = np.full(len(datos), np.nan)
+    if floats.any():
+        resultado[floats] = _normalizar_floats(datos[floats].astype(float))
+    if enteros.any():
+        absolutos = np.abs(datos[enteros].astype(float))
+        resultado[enteros] = np.where(absolutos > 0, absolutos, np.nan)
+    if textos.any():
+        valores = datos[textos]
+        if pd.api.types.infer_dtype(valores) != 'string':
+            valores = pd.Series(valores).map(str).to_numpy(dtype=object)
+        resultado[textos] = _normalizar_textos(valores)
+    
+    return pd.Series(resultado, index=serie.index)
+
+def preparar_df_tienda(df_maestro, url_column, sku_column, precio_column, cuotas_column=None, max_productos=None):
+    """Filas del maestro con URL, con las columnas renombradas a url/sku/precio_maestro/cuotas_maestro"""
+    df_tienda = df_maestro[df_maestro[url_column].notna()].copy()
+    
+    rename_dict = {url_column: 'url', sku_column: 'sku', precio_column: 'precio_maestro'}
+    if cuotas_column:
+        rename_dict[cuotas_column] = 'cuotas_maestro'
+    
+    df_tienda = df_tienda.rename(columns=rename_dict)
+    df_tienda['precio_maestro'] = normalizar_precios(df_tienda['precio_maestro'])
+    
+    if 'cuotas_maestro' in df_tienda.columns:
+        df_tienda['cuotas_maestro'] = pd.to_numeric(df_tienda['cuotas_maestro'], errors='coerce')
+    
+    if max_productos:
+        df_tienda = df_tienda.head(max_productos)
+    return df_tienda
+
+def _ultima_categoria_valida(textos):
+    """Última categoría del breadcrumb que no sea el nombre de la tienda"""
+    categorias_validas = []
+    for texto in textos:
+        texto = (texto or '').strip()
+        # Excluir explícitamente nombres de tiendas
+        if texto and texto.lower() not in ['frávega', 'fravega', 'inicio', 'home']:
+            categorias_validas.append(texto)
+    
+    # Tomar la ÚLTIMA categoría válida
+    return categorias_validas[-1] if categorias_validas else None
+
+_RE_JSON_LD = re.compile(rb'<script[^>]*application/ld\+json[^>]*>(.*?)</script\s*>', re.I | re.S)
+_RE_TAG_METADATO = re.compile(rb'<[a-z][a-z0-9]*\s[^>]*(?:property|itemprop|name)\s*=[^>]*>', re.I)
+_RE_ATRIBUTO = re.compile(rb'([\w:-]+)\s*=\s*(?:"([^"]*)"|\'([^\']*)\')')
+
+CLAVES_TITULO = ('og:title', 'name')
+CLAVES_PRECIO = ('product:price:amount', 'og:price:amount', 'price')
+CLAVES_DISPONIBILIDAD = ('product:availability', 'og:availability', 'availability')
+
+def _en_stock(valor):
+    """True/False según un valor de disponibilidad schema.org u OpenGraph; None si no se reconoce"""
+    valor = str(valor or '').rsplit('/', 1)[-1].strip().lower()
+    if valor in ('instock', 'in stock', 'limitedavailability', 'onlineonly', 'instoreonly'):
+        return True
+    if valor in ('outofstock', 'out of stock', 'soldout', 'discontinued'):
+        return False
+    return None
+
+def _precio_metadato(valor):
+    # schema.org y OpenGraph usan punto decimal sin separador de miles; si no, formato local
+    try:
+        precio = float(valor)
+    except (TypeError, ValueError):
+        precio = limpiar_precio(valor)
+    return precio if precio and precio > 0 else None
+
+def _buscar_producto_json_ld(data):
+    """Primer objeto schema.org Product dentro de un bloque JSON-LD (listas y @graph incluidos)"""
+    pendientes = data if isinstance(data, list) else [data]
+    while pendientes:
+        nodo = pendientes.pop(0)
+        if not isinstance(nodo, dict):
+            continue
+        tipo = nodo.get('@type')
+        if tipo == 'Product' or (isinstance(tipo, list) and 'Product' in tipo):
+            return nodo
+        pendientes.extend(nodo.get('@graph', []))
+    return None
+
+def extraer_datos_estructurados(contenido):
+    """Título, precio y disponibilidad desde JSON-LD, OpenGraph y microdata, escaneando los bytes sin armar DOM"""
+    datos = {'titulo': None, 'precio': None, 'disponible': None}
+    
+    for bloque in _RE_JSON_LD.findall(contenido):
+        try:
+            producto = _buscar_producto_json_ld(json.loads(bloque))
+        except ValueError:
+            continue
+        if producto:
+            ofertas = producto.get('offers') or {}
+            if isinstance(ofertas, list):
+                ofertas = ofertas[0] if ofertas else {}
+            datos['titulo'] = producto.get('name')
+            datos['precio'] = _precio_metadato(ofertas.get('price', ofertas.get('lowPrice')))
+            datos['disponible'] = _en_stock(ofertas.get('availability'))
+            break
+    
+    if None not in datos.values():
+        return datos
+    
+    # <meta property|name|itemprop=... content=...> y microdata con content/href
+    for tag in _RE_TAG_METADATO.finditer(contenido):
+        atributos = {clave.lower(): (v1 or v2) for clave, v1, v2 in _RE_ATRIBUTO.findall(tag.group(0))}
+        clave = (atributos.get(b'property') or atributos.get(b'itemprop') or atributos.get(b'name') or b'').lower()
+        valor = atributos.get(b'content') or atributos.get(b'href')
+        if not valor:
+            continue
+        
+        clave = clave.decode('ascii', 'ignore')
+        valor = html.unescape(valor.decode('utf-8', 'replace')).strip()
+        if clave in CLAVES_TITULO and datos['titulo'] is None:
+            datos['titulo'] = valor
+        elif clave in CLAVES_PRECIO and datos['precio'] is None:
+            datos['precio'] = _precio_metadato(valor)
+        elif clave in CLAVES_DISPONIBILIDAD and datos['disponible'] is None:
+            datos['disponible'] = _en_stock(valor)
+    
+    return datos
+
+# Contenedor de cada opción de cuotas (lo renderiza el cliente, después del precio)
+SELECTOR_BLOQUE_CUOTAS_FRAVEGA = 'div[class*="sc-3cba7521-0"]'
+
+def _datos_fravega_desde_html(soup, cfg):
+    """Mismo payload que JS_FRAVEGA_EXTRAER, armado sobre el HTML que devuelve el servidor"""
+    def texto(selector):
+        el = soup.select_one(selector)
+        return el.get_text() if el else None
+    
+    boton = soup.select_one(cfg['boton'])
+    
+    # Cuotas: SOLO las primeras 2 imágenes de cada bloque (Visa y Mastercard)
+    cuotas = None
+    bloques_cuotas = soup.select(SELECTOR_BLOQUE_CUOTAS_FRAVEGA)
+    for div in bloques_cuotas:
+        span = div.select_one('span[class*="sc-3cba7521-10"]')
+        match = re.search(r'(\d+)\s*cuotas?', span.get_text(), re.IGNORECASE) if span else None
+        imgs = div.select_one('div[class*="sc-3cba7521-3"]')
+        if not match or not imgs:
+            continue
+        
+        srcs = [img['src'].lower() for img in imgs.select('img[src]')]
+        if len(srcs) >= 2 and any(h in src for src in srcs[:2] for h in cfg['visa_master']):
+            cuotas = int(match.group(1))
+            break
+    
+    datos = {
+        'boton_existe': boton is not None,
+        'boton_deshabilitado': boton is not None and (
+            boton.has_attr('disabled') or boton.find_parent(attrs={'aria-disabled': 'true'}) is not None),
+        'boton_texto': boton.get_text() if boton else None,
+        'titulo': texto(cfg['titulo']),
+        'categorias': [el.get_text() for el in soup.select(cfg['categoria'])],
+        'precio': texto(cfg['precio']),
+        'precio_tachado': texto(cfg['precio_tachado']),
+        'descuento': texto(cfg['descuento']),
+        'cuotas': cuotas,
+        'bloque_cuotas': bool(bloques_cuotas)
+    }
+    return datos, bool(bloques_cuotas)
+
+OPCIONES_CONTEXTO_PLAYWRIGHT = {
+    'viewport': {'width': 1920, 'height': 1080},
+    'user_agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
+}
+
+def _coincide_dominio(host, dominios):
+    return any(host == d or host.endswith('.' + d) for d in dominios)
+
+def debe_bloquear_request(bloqueo, tipo_recurso, url):
+    """True si el request de Playwright se aborta según el bloqueo_recursos de la tienda"""
+    if not bloqueo:
+        return False
+    if tipo_recurso in bloqueo.get('tipos', []):
+        return True
+    
+    host = (urlparse(url).hostname or '').lower()
+    if _coincide_dominio(host, bloqueo.get('dominios_permitidos', [])):
+        return False
+    return _coincide_dominio(host, bloqueo.get('dominios_bloqueados', []))
+
+# Página lista: título y botón de compra presentes, y precio presente salvo que el botón esté deshabilitado
+JS_FRAVEGA_LISTA = """([titulo, precio, boton, cuotas]) => {
+    const b = document.querySelector(boton);
+    if (!b || !document.querySelector(titulo)) return false;
+    if (b.disabled || /no disponible/i.test(b.textContent || '')) return true;
+    // Producto habilitado: el bloque de cuotas se renderiza en el cliente, después del precio
+    return !!document.querySelector(precio) && !!document.querySelector(cuotas);
+}"""
+
+# Extracción completa en un solo round-trip: botón, título, categorías, precios y cuotas
+JS_FRAVEGA_EXTRAER = """(cfg) => {
+    const texto = (sel) => { const el = document.querySelector(sel); return el ? el.textContent : null; };
+    const boton = document.querySelector(cfg.boton);
+    
+    // Cuotas: SOLO las primeras 2 imágenes de cada bloque (Visa y Mastercard)
+    let cuotas = null;
+    const bloques = document.querySelectorAll(cfg.bloque_cuotas);
+    for (const div of bloques) {
+        const span = div.querySelector('span[class*="sc-3cba7521-10"]');
+        const match = span ? span.textContent.match(/(\\d+)\\s*cuotas?/i) : null;
+        const imgs = div.querySelector('div[class*="sc-3cba7521-3"]');
+        if (!match || !imgs) continue;
+        
+        const srcs = Array.from(imgs.querySelectorAll('img[src]')).map(img => img.getAttribute('src').toLowerCase());
+        if (srcs.length >= 2 && srcs.slice(0, 2).some(src => cfg.visa_master.some(h => src.includes(h)))) {
+            cuotas = parseInt(match[1], 10);
+            break;
+        }
+    }
+    
+    return {
+        boton_existe: !!boton,
+        boton_deshabilitado: !!boton && (boton.disabled || boton.hasAttribute('disabled') ||
+                                         !!boton.closest('[aria-disabled="true"]')),
+        boton_texto: boton ? boton.textContent : null,
+        titulo: texto(cfg.titulo),
+        categorias: Array.from(document.querySelectorAll(cfg.categoria)).map(el => el.textContent),
+        precio: texto(cfg.precio),
+        precio_tachado: texto(cfg.precio_tachado),
+        descuento: texto(cfg.descuento),
+        cuotas: cuotas,
+        bloque_cuotas: bloques.length > 0,
+        // Bytes transferidos (documento + recursos no bloqueados) en el mismo viaje, según la Resource Timing API
+        bytes_transferidos: performance.getEntries().reduce((total, e) => total + (e.transferSize || 0), 0)
+    };
+}"""
+
+# Hashes de los logos de Visa y Mastercard en el CDN de Frávega
+HASHES_VISA_MASTER_FRAVEGA = ['d91d7904a8578', '54c0d769ece1b']
+
+class PlazoPagina:
+    """Plazo único por página: todas las esperas descuentan del mismo presupuesto"""
+    
+    def __init__(self, limite_ms):
+        self.limite_ms = limite_ms
+        self.inicio = time.perf_counter()
+    
+    def transcurrido_ms(self):
+        return int((time.perf_counter() - self.inicio) * 1000)
+    
+    def restante_ms(self):
+        # Playwright interpreta timeout=0 como "sin límite": nunca devolver menos de 1
+        return max(1, self.limite_ms - self.transcurrido_ms())
+
+class NavegadorPlaywright:
+    """Chromium persistente: se lanza una vez y entrega un contexto/página por URL"""
+    
+    def __init__(self, max_paginas=200, reutilizar_contexto=False, bloqueo_recursos=None):
+        # max_paginas: cantidad de páginas servidas antes de reiniciar Chromium (tope de memoria)
+        self.max_paginas = max_paginas
+        self.reutilizar_contexto = reutilizar_contexto
+        self.bloqueo_recursos = bloqueo_recursos
+        self._playwright = None
+        self._browser = None
+        self._context = None
+        self._paginas_servidas = 0
+    
+    def _nuevo_contexto(self):
+        context = self._browser.new_context(**OPCIONES_CONTEXTO_PLAYWRIGHT)
+        if self.bloqueo_recursos:
+            context.route("**/*", self._enrutar)
+        return context
+    
+    def _enrutar(self, route):
+        request = route.request
+        if debe_bloquear_request(self.bloqueo_recursos, request.resource_type, request.url):
+            route.abort()
+        else:
+            route.continue_()
+    
+    def _iniciar(self):
+        from playwright.sync_api import sync_playwright
+        self._playwright = sync_playwright().start()
+        self._browser = self._playwright.chromium.launch(headless=True)
+        self._paginas_servidas = 0
+    
+    def activo(self):
+        return self._browser is not None and self._browser.is_connected()
+    
+    def reiniciar(self):
+        self.cerrar()
+        self._iniciar()
+    
+    @contextmanager
+    def pagina(self):
+        # Relanzar si Chromium se cayó o si ya sirvió demasiadas páginas
+        if not self.activo() or self._paginas_servidas >= self.max_paginas:
+            self.reiniciar()
+        
+        if self.reutilizar_contexto:
+            if self._context is None:
+                self._context = self._nuevo_contexto()
+            context = self._context
+        else:
+            context = self._nuevo_contexto()
+        
+        page = context.new_page()
+        self._paginas_servidas += 1
+        try:
+            yield page
+        finally:
+            try:
+                if self.reutilizar_contexto:
+                    page.close()
+                else:
+                    context.close()
+            except Exception:
+                pass
+    
+    def cerrar(self):
+        for recurso in (self._context, self._browser):
+            if recurso is not None:
+                try:
+                    recurso.close()
+                except Exception:
+                    pass
+        if self._playwright is not None:
+            try:
+                self._playwright.stop()
+            except Exception:
+                pass
+        self._playwright = None
+        self._browser = None
+        self._context = None
+
+HEADERS_HTTP = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
+    'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8',
+    'Accept-Language': 'es-AR,es;q=0.9,en;q=0.8',
+    'Referer': 'https://www.google.com/'
+}
+
+# Tope global de requests en vuelo del motor async (cada tienda tiene además su max_conexiones_host)
+MAX_CONEXIONES_TOTALES = 300
+
+# Cache HTTP, checkpoints e historial viven fuera del repo
+DIRECTORIO_DATOS = os.environ.get('AUDITOR_DATOS', os.path.join(os.path.expanduser('~'), '.auditor'))
+
+class CacheHTTP:
+    """Cache en disco (SQLite) de páginas de producto con TTL, revalidación ETag/Last-Modified y tope de tamaño"""
+    
+    def __init__(self, ruta=None, ttl_s=8 * 3600, max_bytes=500 * 1024 * 1024, forzar=False):
+        # forzar: ignora las copias guardadas (siempre descarga) pero sigue guardando lo nuevo
+        self.ruta = ruta or os.path.join(DIRECTORIO_DATOS, 'cache_http.sqlite')
+        self.ttl_s = ttl_s
+        self.max_bytes = max_bytes
+        self.forzar = forzar
+        self._lock = threading.Lock()
+        
+        os.makedirs(os.path.dirname(self.ruta), exist_ok=True)
+        self._conn = sqlite3.connect(self.ruta, timeout=30, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("""CREATE TABLE IF NOT EXISTS paginas (
+            url TEXT PRIMARY KEY, contenido BLOB, etag TEXT, last_modified TEXT,
+            guardado REAL, ultimo_acceso REAL, tamano INTEGER)""")
+        self._conn.commit()
+    
+    def _leer(self, url):
+        with self._lock:
+            fila = self._conn.execute(
+                "SELECT contenido, etag, last_modified, guardado FROM paginas WHERE url = ?", (url,)).fetchone()
+        if not fila:
+            return None
+        return {'contenido': fila[0], 'etag': fila[1], 'last_modified': fila[2], 'guardado': fila[3]}
+    
+    def consultar(self, url):
+        """(contenido, headers): contenido si la copia sigue fresca; si no, headers para un GET condicional"""
+        if self.forzar:
+            return None, {}
+        
+        entrada = self._leer(url)
+        if not entrada:
+            return None, {}
+        
+        if time.time() - entrada['guardado'] < self.ttl_s:
+            with self._lock:
+                self._conn.execute("UPDATE paginas SET ultimo_acceso = ? WHERE url = ?", (time.time(), url))
+                self._conn.commit()
+            return entrada['contenido'], {}
+        
+        headers = {}
+        if entrada['etag']:
+            headers['If-None-Match'] = entrada['etag']
+        if entrada['last_modified']:
+            headers['If-Modified-Since'] = entrada['last_modified']
+        return None, headers
+    
+    def actualizar(self, url, status, headers, contenido):
+        """Guarda un 200 o renueva la copia ante un 304; devuelve el (status, contenido) a procesar"""
+        ahora = time.time()
+        
+        if status == 304:
+            entrada = self._leer(url)
+            if not entrada:
+                return status, contenido
+            with self._lock:
+                self._conn.execute("UPDATE paginas SET guardado = ?, ultimo_acceso = ? WHERE url = ?", (ahora, ahora, url))
+                self._conn.commit()
+            return 200, entrada['contenido']
+        
+        if status == 200:
+            with self._lock:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO paginas VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (url, contenido, headers.get('ETag'), headers.get('Last-Modified'), ahora, ahora, len(contenido)))
+                self._conn.commit()
+            self._podar()
+        
+        return status, contenido
+    
+    def _podar(self):
+        # Desalojo LRU hasta quedar bajo el tope de tamaño
+        with self._lock:
+            total = self._conn.execute("SELECT COALESCE(SUM(tamano), 0) FROM paginas").fetchone()[0]
+            if total <= self.max_bytes:
+                return
+            for url, tamano in self._conn.execute("SELECT url, tamano FROM paginas ORDER BY ultimo_acceso").fetchall():
+                self._conn.execute("DELETE FROM paginas WHERE url = ?", (url,))
+                total -= tamano
+                if total <= self.max_bytes:
+                    break
+            self._conn.commit()
+    
+    def cerrar(self):
+        with self._lock:
+            self._conn.close()
+
+def es_resultado_final(resultado):
+    """Un resultado que no hace falta volver a pedir: ni error técnico ni activo sin precio"""
+    estado = resultado.get('estado_producto')
+    return estado != 'Error' and not (estado == 'Activo' and not resultado.get('precio_web'))
+
+class CheckpointAuditoria:
+    """Resultados de una auditoría guardados en SQLite a medida que llegan, para poder reanudarla si se corta"""
+    
+    def __init__(self, trabajos, reanudar=False, ruta=None, dias_retencion=7, vigencia_s=8 * 3600):
+        # trabajos: (tienda, url) de la auditoría; mismas tiendas y URLs = la misma auditoría
+        # vigencia_s: solo se reanuda una auditoría que empezó hace menos que esto (precios viejos no pasan por actuales)
+        self.ruta = ruta or os.path.join(DIRECTORIO_DATOS, 'checkpoints.sqlite')
+        self.huella = hashlib.sha1('\n'.join(sorted({f'{t}\t{u}' for t, u in trabajos})).encode()).hexdigest()
+        self._lock = threading.Lock()
+        
+        os.makedirs(os.path.dirname(self.ruta), exist_ok=True)
+        self._conn = sqlite3.connect(self.ruta, timeout=30, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("""CREATE TABLE IF NOT EXISTS auditorias (
+            id TEXT PRIMARY KEY, huella TEXT, inicio REAL, fin REAL)""")
+        self._conn.execute("""CREATE TABLE IF NOT EXISTS resultados (
+            auditoria TEXT, tienda TEXT, url TEXT, resultado TEXT, final INTEGER, guardado REAL,
+            PRIMARY KEY (auditoria, tienda, url))""")
+        
+        # Auditorías terminadas, o abandonadas a medias, hace más de dias_retencion ya no se van a reanudar
+        ahora = time.time()
+        limite = ahora - dias_retencion * 86400
+        viejas = "SELECT id FROM auditorias WHERE COALESCE(fin, inicio) < ?"
+        self._conn.execute(f"DELETE FROM resultados WHERE auditoria IN ({viejas})", (limite,))
+        self._conn.execute(f"DELETE FROM auditorias WHERE id IN ({viejas})", (limite,))
+        
+        fila = None
+        if reanudar:
+            fila = self._conn.execute(
+                "SELECT id, inicio FROM auditorias WHERE huella = ? AND fin IS NULL AND inicio >= ? "
+                "ORDER BY inicio DESC LIMIT 1",
+                (self.huella, ahora - vigencia_s)).fetchone()
+        self.reanudada = fila is not None
+        # Horas desde que empezó la auditoría que se retoma (0 si es nueva)
+        self.edad_h = round((ahora - fila[1]) / 3600, 1) if fila else 0.0
+        if fila:
+            self.auditoria = fila[0]
+        else:
+            self.auditoria = f"{self.huella[:12]}-{time.time_ns()}"
+            self._conn.execute("INSERT INTO auditorias VALUES (?, ?, ?, NULL)", (self.auditoria, self.huella, time.time()))
+        self._conn.commit()
+    
+    def previos(self, tienda):
+        """{url: resultado} ya resueltos en esta auditoría; errores y activos sin precio se vuelven a intentar"""
+        with self._lock:
+            filas = self._conn.execute(
+                "SELECT url, resultado FROM resultados WHERE auditoria = ? AND tienda = ? AND final = 1",
+                (self.auditoria, tienda)).fetchall()
+        return {url: json.loads(resultado) for url, resultado in filas}
+    
+    def guardar(self, tienda, url, resultado):
+        datos = {k: v for k, v in resultado.items() if k != 'idx' and k not in CLAVES_MEDICION}
+        final = es_resultado_final(resultado)
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO resultados VALUES (?, ?, ?, ?, ?, ?)",
+                (self.auditoria, tienda, url, json.dumps(datos, default=str), int(final), time.time()))
+            self._conn.commit()
+    
+    def finalizar(self):
+        with self._lock:
+            self._conn.execute("UPDATE auditorias SET fin = ? WHERE id = ?", (time.time(), self.auditoria))
+            self._conn.commit()
+    
+    def cerrar(self):
+        with self._lock:
+            self._conn.close()
+
+class HistorialAuditorias:
+    """Último resultado por tienda/SKU/URL, con el precio y las cuotas del maestro contra los que se verificó"""
+    
+    def __init__(self, ruta=None):
+        self.ruta = ruta or os.path.join(DIRECTORIO_DATOS, 'historial.sqlite')
+        self._lock = threading.Lock()
+        
+        os.makedirs(os.path.dirname(self.ruta), exist_ok=True)
+        self._conn = sqlite3.connect(self.ruta, timeout=30, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("""CREATE TABLE IF NOT EXISTS historial (
+            tienda TEXT, sku TEXT, url TEXT, precio_maestro REAL, cuotas_maestro REAL,
+            resultado TEXT, final INTEGER, verificado REAL,
+            PRIMARY KEY (tienda, sku, url))""")
+        self._conn.commit()
+    
+    @staticmethod
+    def _claves(df_tienda):
+        cuotas = df_tienda['cuotas_maestro'] if 'cuotas_maestro' in df_tienda.columns else np.nan
+        return pd.DataFrame({
+            'sku': df_tienda['sku'].astype(str),
+            'url': df_tienda['url'].astype(str),
+            'precio_maestro': pd.to_numeric(df_tienda['precio_maestro'], errors='coerce'),
+            'cuotas_maestro': pd.to_numeric(cuotas, errors='coerce') if 'cuotas_maestro' in df_tienda.columns else cuotas,
+        }, index=df_tienda.index)
+    
+    def guardar(self, tienda, df_tienda, resultados):
+        """Registra lo recién escaneado junto con los datos del maestro de esa fila"""
+        claves = self._claves(df_tienda).loc[[r['idx'] for r in resultados]]
+        claves = claves.astype(object).where(claves.notna(), None)
+        ahora = time.time()
+        filas = []
+        for resultado, (sku, url, precio, cuotas) in zip(resultados, claves.itertuples(index=False, name=None)):
+            datos = {k: v for k, v in resultado.items() if k not in ('idx', 'edad_h') and k not in CLAVES_MEDICION}
+            filas.append((tienda, sku, url, precio, cuotas,
+                          json.dumps(datos, default=str), int(es_resultado_final(resultado)), ahora))
+        with self._lock:
+            self._conn.executemany("INSERT OR REPLACE INTO historial VALUES (?, ?, ?, ?, ?, ?, ?, ?)", filas)
+            self._conn.commit()
+    
+    def plan_delta(self, tienda, df_tienda, edad_max_s):
+        """(máscara de filas a escanear, resultados reutilizados del historial con su antigüedad en 'edad_h')"""
+        with self._lock:
+            historial = pd.read_sql_query(
+                "SELECT sku, url, precio_maestro AS precio_previo, cuotas_maestro AS cuotas_previas, "
+                "resultado, final, verificado FROM historial WHERE tienda = ?", self._conn, params=(tienda,),
+                dtype={'precio_previo': 'float64', 'cuotas_previas': 'float64', 'final': 'float64', 'verificado': 'float64'})
+        
+        claves = self._claves(df_tienda)
+        cruce = claves.assign(_idx=claves.index).merge(historial, on=['sku', 'url'], how='left').set_index('_idx')
+        
+        def sin_cambios(actual, previo):
+            return pd.Series(np.isclose(actual, previo), index=cruce.index) | (actual.isna() & previo.isna())
+        
+        # Se re-escanea: SKU nuevo o con otra URL, precio o cuotas del maestro cambiados, dato viejo o fallido
+        ahora = time.time()
+        reusar = (cruce['final'].eq(1)
+                  & sin_cambios(cruce['precio_maestro'], cruce['precio_previo'])
+                  & sin_cambios(cruce['cuotas_maestro'], cruce['cuotas_previas'])
+                  & (ahora - cruce['verificado'] <= edad_max_s))
+        
+        reusados = []
+        for idx, resultado, verificado in zip(cruce.index[reusar], cruce['resultado'][reusar], cruce['verificado'][reusar]):
+            resultado = json.loads(resultado)
+            resultado['idx'] = idx
+            resultado['edad_h'] = round((ahora - verificado) / 3600, 1)
+            reusados.append(resultado)
+        
+        return pd.Series(~reusar.to_numpy(), index=df_tienda.index), reusados
+    
+    def cerrar(self):
+        with self._lock:
+            self._conn.close()
+
+# Frases que marcan un producto dado de baja en el texto visible de la página
+FRASES_NO_DISPONIBLE = ('no longer available', 'no está disponible')
+
+def posible_no_disponible(contenido):
+    """Filtro sobre bytes crudos: False garantiza que ninguna FRASES_NO_DISPONIBLE está en la página"""
+    crudo = contenido.lower()
+    return b'no longer available' in crudo or b'no est' in crudo
+
+class LectorParcial:
+    """Parser incremental (lxml) para cortar la descarga cuando ya cerraron el bloque del producto y sus selectores
+    
+    Nunca corta por tamaño: si el bloque no aparece, la página se lee entera (como sin lectura parcial).
+    """
+    
+    TAMANO_BLOQUE = 16 * 1024
+    
+    def __init__(self, config):
+        # El bloque de lectura_parcial descarta el aviso de "no disponible"; los selectores, el precio
+        self.selectores = [CSSSelector(config['lectura_parcial'])] + [
+            CSSSelector(config[f'selector_{campo}'])
+            for campo in ('precio', 'precio_tachado', 'descuento') if config.get(f'selector_{campo}')]
+        self._parser = etree.HTMLPullParser(events=('end',))
+        self._cerrados = set()
+        self._partes = []
+        self.bytes_leidos = 0
+        self.cortado = False
+    
+    def alimentar(self, bloque):
+        """Suma un bloque; True cuando ya no hace falta seguir leyendo"""
+        self._partes.append(bloque)
+        self.bytes_leidos += len(bloque)
+        self._parser.feed(bloque)
+        
+        root = None
+        for _, elem in self._parser.read_events():
+            self._cerrados.add(elem)
+            root = elem.getroottree().getroot()
+        
+        # Un selector cuenta cuando su primer match ya cerró (texto completo)
+        completo = root is not None and all(
+            (matches := selector(root)) and matches[0] in self._cerrados for selector in self.selectores)
+        self.cortado = completo
+        return self.cortado
+    
+    def contenido(self):
+        return b''.join(self._partes)
+
+class ExtractorBS4:
+    """Backend original: árbol completo de BeautifulSoup con html.parser"""
+    
+    def __init__(self, config):
+        self.config = config
+    
+    def extraer(self, contenido):
+        soup = BeautifulSoup(contenido, 'html.parser')
+        
+        html_text = soup.get_text().lower()
+        datos = {'no_disponible': any(frase in html_text for frase in FRASES_NO_DISPONIBLE)}
+        
+        for campo in ('precio', 'precio_tachado', 'descuento'):
+            selector = self.config.get(f'selector_{campo}')
+            elem = soup.select_one(selector) if selector else None
+            datos[campo] = elem.get_text(strip=True) if elem is not None else None
+        return datos
+
+class ExtractorLxml:
+    """Parser C de lxml con los selectores de la tienda compilados una sola vez"""
+    
+    def __init__(self, config):
+        self.config = config
+        self.selectores = {}
+        for campo in ('precio', 'precio_tachado', 'descuento'):
+            selector = config.get(f'selector_{campo}')
+            if selector:
+                self.selectores[campo] = CSSSelector(selector)
+        # Mismo texto que BeautifulSoup.get_text(): sin scripts, estilos ni comentarios
+        self._texto_visible = etree.XPath(
+            '//text()[not(ancestor::script) and not(ancestor::style) and not(ancestor::template)]')
+    
+    def _no_disponible(self, contenido, root):
+        # Filtro barato sobre los bytes crudos; el texto del árbol solo se arma si alguna frase aparece
+        if not posible_no_disponible(contenido):
+            return False
+        texto = ''.join(self._texto_visible(root)).lower()
+        return any(frase in texto for frase in FRASES_NO_DISPONIBLE)
+    
+    @staticmethod
+    def _decodificar(contenido):
+        """Texto del HTML con la misma detección de encoding que BeautifulSoup
+        
+        Con bytes, lxml asume latin-1 si la página no declara <meta charset> (el charset puede venir solo en
+        el header HTTP): 'no está disponible' quedaría como 'no estÃ¡ disponible' y nunca coincidiría.
+        """
+        if isinstance(contenido, str):
+            return contenido
+        return UnicodeDammit(contenido, is_html=True).unicode_markup
+    
+    def extraer(self, contenido):
+        datos = {'no_disponible': False, 'precio': None, 'precio_tachado': None, 'descuento': None}
+        try:
+            root = lxml.html.document_fromstring(self._decodificar(contenido))
+        except ValueError:
+            # Declaración <?xml encoding=...?>: lxml no acepta str con encoding declarado, va con los bytes
+            root = lxml.html.document_fromstring(contenido)
+        except etree.ParserError:
+            return datos  # Documento vacío
+        
+        datos['no_disponible'] = self._no_disponible(contenido, root)
+        for campo, selector in self.selectores.items():
+            elems = selector(root)
+            if elems:
+                datos[campo] = ''.join(t.strip() for t in elems[0].itertext())
+        return datos
+
+EXTRACTORES_HTML = {'bs4': ExtractorBS4}
+if LXML_AVAILABLE:
+    EXTRACTORES_HTML['lxml'] = ExtractorLxml
+
+_extractores_compilados = {}
+
+def obtener_extractor(tienda, config, backend=None):
+    """Extractor de la tienda, creado (y con sus selectores compilados) una vez por proceso"""
+    backend = backend or config.get('extractor') or ('lxml' if LXML_AVAILABLE else 'bs4')
+    clave = (tienda, backend)
+    if clave not in _extractores_compilados:
+        _extractores_compilados[clave] = EXTRACTORES_HTML[backend](config)
+    return _extractores_compilados[clave]
+
+# Fases medidas por URL, en el orden en que ocurren. Con requests, respuesta incluye DNS y conexión
+FASES_URL = ('cola', 'dns', 'conexion', 'respuesta', 'descarga', 'navegacion', 'espera', 'extraccion', 'parseo')
+# Telemetría de la corrida: no se guarda en checkpoints/historial ni se copia a las filas deduplicadas
+CLAVES_MEDICION = tuple(f'{fase}_ms' for fase in FASES_URL) + ('total_ms', 'bytes', 'fin', 'desde_cache')
+
+class CronometroURL:
+    """Tiempos por fase y bytes de una URL; volcar() los deja en el resultado"""
+    
+    def __init__(self):
+        self.inicio = time.perf_counter()
+        self.ms = {}
+        self.bytes = 0
+        self.desde_cache = False
+    
+    def sumar(self, fase, ms):
+        self.ms[fase] = self.ms.get(fase, 0.0) + max(0.0, ms)
+    
+    @contextmanager
+    def fase(self, nombre):
+        inicio = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.sumar(nombre, (time.perf_counter() - inicio) * 1000)
+    
+    def volcar(self, resultado):
+        # Se puede volcar más de una vez (Frávega HTTP -> navegador): la última llamada tiene el total
+        if resultado is None:
+            return None
+        for fase, ms in self.ms.items():
+            resultado[f'{fase}_ms'] = round(ms, 1)
+        resultado['total_ms'] = round((time.perf_counter() - self.inicio) * 1000, 1)
+        resultado['bytes'] = self.bytes
+        resultado['fin'] = time.time()
+        if self.desde_cache:
+            resultado['desde_cache'] = True
+        return resultado
+
+class WebScraper:
+    def __init__(self, tienda_config, tienda_nombre, cache=None):
+        self.config = tienda_config
+        self.tienda = tienda_nombre
+        self.cache = cache
+        self.session = requests.Session()
+        self.session.headers.update(HEADERS_HTTP)
+        self._navegador = None
+    
+    def _obtener_navegador(self):
+        # El navegador vive lo que dura el scraper (una auditoría), no una URL
+        if self._navegador is None:
+            self._navegador = NavegadorPlaywright(
+                max_paginas=self.config.get('max_paginas_por_navegador', 200),
+                bloqueo_recursos=self.config.get('bloqueo_recursos')
+            )
+        return self._navegador
+    
+    def cerrar(self):
+        if self._navegador is not None:
+            self._navegador.cerrar()
+            self._navegador = None
+    
+    def nuevo_lector(self):
+        """LectorParcial si la tienda configuró lectura_parcial, o None para leer la respuesta entera"""
+        if self.tienda == "Fravega" or not LXML_AVAILABLE or not self.config.get('lectura_parcial'):
+            return None
+        return LectorParcial(self.config)
+    
+    def _descargar(self, url, cron=None):
+        """GET pasando por la cache HTTP (si hay): (status, motivo, contenido)"""
+        cron = cron or CronometroURL()
+        headers = {}
+        if self.cache:
+            contenido, headers = self.cache.consultar(url)
+            if contenido is not None:
+                cron.desde_cache = True
+                return 200, 'OK', contenido
+        
+        lector = self.nuevo_lector()
+        inicio = time.perf_counter()
+        response = self.session.get(url, timeout=15, headers=headers, stream=lector is not None)
+        try:
+            if lector and response.status_code == 200:
+                for bloque in response.iter_content(chunk_size=LectorParcial.TAMANO_BLOQUE):
+                    if lector.alimentar(bloque):
+                        break
+                contenido = lector.contenido()
+            else:
+                contenido = response.content
+        finally:
+            # Si se cortó antes del final, la conexión se descarta en vez de leer el resto
+            response.close()
+        
+        # elapsed: desde el envío hasta tener los headers (incluye DNS y conexión); el resto es el cuerpo
+        respuesta_ms = response.elapsed.total_seconds() * 1000
+        cron.sumar('respuesta', respuesta_ms)
+        cron.sumar('descarga', (time.perf_counter() - inicio) * 1000 - respuesta_ms)
+        cron.bytes += len(contenido)
+        
+        # Un cuerpo cortado no se cachea: un 304 posterior (mismo ETag) repetiría la página incompleta
+        if not self.cache or (lector and lector.cortado):
+            return response.status_code, response.reason, contenido
+        
+        status, contenido = self.cache.actualizar(url, response.status_code, response.headers, contenido)
+        return status, response.reason if status == response.status_code else 'OK', contenido
+    
+    def _resultado_base(self, url, estado_producto='Activo', estado_scraping='✅ OK'):
+        return {
+            'url': url,
+            'titulo': None,
+            'precio_web': None,
+            'precio_tachado': None,
+            'descuento_%': None,
+            'categoria': None,
+            'cuotas': None,
+            'estado_producto': estado_producto,
+            'estado_scraping': estado_scraping,
+            'timestamp': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        }
+    
+    def _validar_url_fravega(self, url):
+        """Devuelve un resultado de error si la URL no sirve, o None si es válida"""
+        # VALIDACIÓN: URL debe ser válida
+        if not url or not isinstance(url, str):
+            return self._resultado_base(url, 'Error', '❌ URL inválida')
+        
+        # VALIDACIÓN: URL debe comenzar con http:// o https://
+        if not url.startswith('http://') and not url.startswith('https://'):
+            return self._resultado_base(url, 'Error', '❌ URL incompleta - falta https://')
+        
+        # VALIDACIÓN: URL muy corta
+        if len(url) < 30:
+            return self._resultado_base(url, 'Error', '❌ URL demasiado corta')
+        
+        return None
+    
+    def _selectores_lista(self):
+        return [self.config['selector_titulo'], self.config['selector_precio'], self.config['selector_boton_compra'],
+                SELECTOR_BLOQUE_CUOTAS_FRAVEGA]
+    
+    def _config_extraccion_fravega(self):
+        return {
+            'boton': self.config['selector_boton_compra'],
+            'titulo': self.config['selector_titulo'],
+            'categoria': self.config['selector_categoria'],
+            'precio': self.config['selector_precio'],
+            'precio_tachado': self.config['selector_precio_tachado'],
+            'descuento': self.config['selector_descuento'],
+            'bloque_cuotas': SELECTOR_BLOQUE_CUOTAS_FRAVEGA,
+            'visa_master': HASHES_VISA_MASTER_FRAVEGA
+        }
+    
+    def _aplicar_extraccion_fravega(self, resultado, datos):
+        """Vuelca en resultado el payload de JS_FRAVEGA_EXTRAER"""
+        # PRIMERO: Verificar si está inhabilitado
+        texto_boton = (datos['boton_texto'] or '').lower()
+        producto_inhabilitado = (not datos['boton_existe'] or datos['boton_deshabilitado'] or
+                                 'no disponible' in texto_boton)
+        
+        # Título y categoría (siempre)
+        if datos['titulo']:
+            resultado['titulo'] = datos['titulo'].strip()
+        resultado['categoria'] = _ultima_categoria_valida(datos['categorias'])
+        
+        # Si está inhabilitado, marcar correctamente y NO tomar precios
+        if producto_inhabilitado:
+            resultado['estado_producto'] = 'Inhabilitado'
+            resultado['estado_scraping'] = '⚠️ Botón de compra deshabilitado'
+            resultado['cuotas'] = None
+            return resultado
+        
+        resultado['precio_web'] = limpiar_precio(datos['precio'])
+        resultado['precio_tachado'] = limpiar_precio(datos['precio_tachado'])
+        
+        match = re.search(r'(\d+)', datos['descuento'] or '')
+        if match:
+            resultado['descuento_%'] = float(match.group(1))
+        
+        # Con el bloque de cuotas renderizado y sin Visa/Mastercard se asume 1 pago; si el bloque nunca apareció
+        # (se venció el plazo) las cuotas quedan desconocidas, no 1: si no, serían "Cuotas incorrectas" falsas
+        if datos['cuotas']:
+            resultado['cuotas'] = datos['cuotas']
+        elif datos.get('bloque_cuotas'):
+            resultado['cuotas'] = 1
+        else:
+            resultado['cuotas'] = None
+            resultado['estado_scraping'] = '⚠️ No cargaron las cuotas'
+        
+        # Validar que se haya scrapeado el precio
+        if not resultado['precio_web']:
+            resultado['estado_scraping'] = '⚠️ No se obtuvo el precio'
+        
+        return resultado
+    
+    def scrape_fravega_http(self, url, cron=None):
+        """Intento sin navegador sobre el HTML del servidor; None si hace falta Playwright"""
+        error = self._validar_url_fravega(url)
+        if error:
+            return error
+        
+        cron = cron or CronometroURL()
+        try:
+            return cron.volcar(self.procesar_respuesta(url, *self._descargar(url, cron)))
+        except Exception:
+            return None
+    
+    def _parsear_fravega_html(self, url, contenido):
+        soup = BeautifulSoup(contenido, 'html.parser')
+        datos, hay_cuotas = _datos_fravega_desde_html(soup, self._config_extraccion_fravega())
+        
+        # Lo que el DOM del servidor no trae se completa con los datos estructurados del producto
+        meta = extraer_datos_estructurados(contenido)
+        if not datos['boton_existe'] and meta['disponible'] is not None:
+            datos['boton_existe'] = True
+            datos['boton_deshabilitado'] = not meta['disponible']
+        if not datos['titulo']:
+            datos['titulo'] = meta['titulo']
+        if not datos['precio'] and meta['precio']:
+            datos['precio'] = f"{meta['precio']:.2f}"
+        
+        # Sin estado del botón no se puede distinguir activo de inhabilitado
+        if not datos['boton_existe']:
+            return None
+        
+        resultado = self._resultado_base(url)
+        resultado['via'] = 'http'
+        self._aplicar_extraccion_fravega(resultado, datos)
+        
+        # Un producto activo necesita precio y el bloque de cuotas renderizado
+        if resultado['estado_producto'] == 'Activo' and (not resultado['precio_web'] or not hay_cuotas):
+            return None
+        
+        return resultado
+    
+    def scrape_fravega_con_playwright(self, url, cron=None):
+        """Scrapea Frávega usando Playwright para contenido dinámico"""
+        error = self._validar_url_fravega(url)
+        if error:
+            return error
+        
+        cron = cron or CronometroURL()
+        resultado = self._resultado_base(url)
+        resultado['via'] = 'navegador'
+        
+        try:
+            with self._obtener_navegador().pagina() as page:
+                plazo = PlazoPagina(self.config.get('timeout_pagina_ms', 15000))
+                
+                with cron.fase('navegacion'):
+                    page.goto(url, wait_until='domcontentloaded', timeout=plazo.restante_ms())
+                with cron.fase('espera'):
+                    try:
+                        page.wait_for_function(JS_FRAVEGA_LISTA, arg=self._selectores_lista(), timeout=plazo.restante_ms())
+                    except Exception:
+                        pass  # Vencido el plazo se extrae lo que haya renderizado
+                
+                with cron.fase('extraccion'):
+                    datos = page.evaluate(JS_FRAVEGA_EXTRAER, self._config_extraccion_fravega())
+                    self._aplicar_extraccion_fravega(resultado, datos)
+                cron.bytes += datos.get('bytes_transferidos') or 0
+                
+        except Exception as e:
+            resultado['estado_producto'] = 'Error'
+            resultado['estado_scraping'] = f'❌ {str(e)[:40]}'
+        
+        return cron.volcar(resultado)
+    
+    async def scrape_fravega_async(self, context, url, cron=None):
+        """Versión async de scrape_fravega_con_playwright sobre un contexto de playwright.async_api"""
+        error = self._validar_url_fravega(url)
+        if error:
+            return error
+        
+        cron = cron or CronometroURL()
+        resultado = self._resultado_base(url)
+        resultado['via'] = 'navegador'
+        
+        try:
+            page = await context.new_page()
+            plazo = PlazoPagina(self.config.get('timeout_pagina_ms', 15000))
+            
+            with cron.fase('navegacion'):
+                await page.goto(url, wait_until='domcontentloaded', timeout=plazo.restante_ms())
+            with cron.fase('espera'):
+                try:
+                    await page.wait_for_function(JS_FRAVEGA_LISTA, arg=self._selectores_lista(), timeout=plazo.restante_ms())
+                except Exception:
+                    pass
+            
+            with cron.fase('extraccion'):
+                datos = await page.evaluate(JS_FRAVEGA_EXTRAER, self._config_extraccion_fravega())
+                self._aplicar_extraccion_fravega(resultado, datos)
+            cron.bytes += datos.get('bytes_transferidos') or 0
+            
+        except Exception as e:
+            resultado['estado_producto'] = 'Error'
+            resultado['estado_scraping'] = f'❌ {str(e)[:40]}'
+        
+        return cron.volcar(resultado)
+    
+    def scrape_url(self, url):
+        # Un cronómetro por URL: las fases de cada intento se suman al mismo total
+        cron = CronometroURL()
+        
+        # Frávega: HTML del servidor primero, Playwright solo si faltan datos
+        if self.tienda == "Fravega":
+            if self.config.get('http_primero'):
+                resultado = self.scrape_fravega_http(url, cron)
+                if resultado:
+                    return resultado
+            if PLAYWRIGHT_AVAILABLE:
+                return self.scrape_fravega_con_playwright(url, cron)
+            else:
+                return self._resultado_base(url, 'Error', '❌ Playwright no disponible')
+        
+        # Para otras tiendas, usar requests
+        try:
+            return cron.volcar(self.procesar_respuesta(url, *self._descargar(url, cron)))
+        except Exception as e:
+            return cron.volcar(self._resultado_base(url, 'Error', f'❌ {str(e)[:30]}'))
+    
+    def procesar_respuesta(self, url, status, motivo, contenido):
+        """Resultado a partir de una respuesta ya descargada (None: Frávega necesita navegador)"""
+        # Medido acá y no afuera: con la tubería de parseo esto corre en otro proceso
+        inicio = time.perf_counter()
+        resultado = self._procesar_respuesta(url, status, motivo, contenido)
+        if resultado is not None:
+            resultado['parseo_ms'] = round((time.perf_counter() - inicio) * 1000, 1)
+        return resultado
+    
+    def _procesar_respuesta(self, url, status, motivo, contenido):
+        if self.tienda == "Fravega":
+            return self._parsear_fravega_html(url, contenido) if status == 200 else None
+        
+        if status == 404:
+            return self._resultado_base(url, 'No disponible', '⚠️ Error 404')
+        if status >= 400:
+            # Mismo texto que requests.HTTPError
+            tipo = 'Client' if status < 500 else 'Server'
+            return self._resultado_base(url, 'Error', f'❌ {f"{status} {tipo} Error: {motivo} for url: {url}"[:30]}')
+        
+        try:
+            return self._parsear_html(url, contenido)
+        except Exception as e:
+            return self._resultado_base(url, 'Error', f'❌ {str(e)[:30]}')
+    
+    def _parsear_html(self, url, contenido):
+        resultado = self._resultado_base(url)
+        meta = extraer_datos_estructurados(contenido)
+        resultado['titulo'] = meta['titulo']
+        
+        # Precio tachado y descuento no vienen en schema.org/OpenGraph: el DOM solo se evita en tiendas que no
+        # los buscan (BNA, Megatone) y cuando la metadata trae precio; si no, queda como respaldo del precio
+        solo_metadata = not any(self.config.get(f'selector_{campo}') for campo in ('precio_tachado', 'descuento'))
+        if solo_metadata and meta['precio'] and not posible_no_disponible(contenido):
+            datos = {'no_disponible': False, 'precio': None, 'precio_tachado': None, 'descuento': None}
+        else:
+            datos = obtener_extractor(self.tienda, self.config).extraer(contenido)
+        
+        # schema.org OutOfStock vale tanto como el texto de la página
+        if datos['no_disponible'] or meta['disponible'] is False:
+            resultado['estado_producto'] = 'No disponible'
+            resultado['estado_scraping'] = '⚠️ Producto no disponible'
+            return resultado
+        
+        if datos['precio']:
+            resultado['precio_web'] = limpiar_precio(datos['precio'])
+        
+        # Selector roto (clases hasheadas que cambian) o metadata-primero: precio de los datos estructurados
+        if not resultado['precio_web']:
+            resultado['precio_web'] = meta['precio']
+        
+        if datos['precio_tachado']:
+            resultado['precio_tachado'] = limpiar_precio(datos['precio_tachado'])
+        
+        if datos['descuento']:
+            match = re.search(r'(\d+)', datos['descuento'])
+            if match:
+                resultado['descuento_%'] = float(match.group(1))
+        
+        if self.tienda == "Galicia" and not resultado['precio_tachado'] and resultado['descuento_%'] and resultado['precio_web']:
+            descuento_decimal = resultado['descuento_%'] / 100
+            resultado['precio_tachado'] = resultado['precio_web'] / (1 - descuento_decimal)
+        
+        if not resultado['precio_web']:
+            resultado['estado_scraping'] = '⚠️ No se obtuvo el precio'
+        
+        return resultado
+
+def _segundos_retry_after(valor):
+    """Retry-After en segundos (acepta número o fecha HTTP); None si no vino o no se entiende"""
+    if not valor:
+        return None
+    try:
+        return max(0.0, float(valor))
+    except ValueError:
+        pass
+    try:
+        fecha = parsedate_to_datetime(valor)
+        return max(0.0, (fecha - datetime.now(fecha.tzinfo)).total_seconds())
+    except (TypeError, ValueError):
+        return None
+
+class ControlConcurrencia:
+    """Requests en vuelo por tienda que suben o bajan según latencia, 429/5xx y Retry-After"""
+    
+    def __init__(self, tienda, inicial=4, minimo=1, maximo=16, latencia_objetivo=2.0, ventana=20,
+                 max_retry_after=300.0):
+        self.tienda = tienda
+        # Un Retry-After más largo que esto no pausa la tienda: la URL se da por fallida
+        self.max_retry_after = max_retry_after
+        self.limite = max(minimo, min(inicial, maximo))
+        self.minimo = minimo
+        self.maximo = maximo
+        self.latencia_objetivo = latencia_objetivo
+        self.ventana = ventana
+        self.en_vuelo = 0
+        self.pausa_hasta = 0.0
+        self._latencias = []
+        self._ultimo_recorte = 0.0
+        self._cond = None
+    
+    @classmethod
+    def desde_config(cls, tienda, config):
+        return cls(
+            tienda,
+            inicial=config.get('concurrencia_inicial', 4),
+            maximo=config.get('max_conexiones_host', 16),
+            latencia_objetivo=config.get('latencia_objetivo_s', 2.0),
+            max_retry_after=config.get('max_retry_after_s', 300.0)
+        )
+    
+    async def adquirir(self):
+        if self._cond is None:
+            self._cond = asyncio.Condition()
+        async with self._cond:
+            await self._cond.wait_for(lambda: self.en_vuelo < self.limite)
+            self.en_vuelo += 1
+        
+        # Si el sitio pidió esperar (Retry-After), nadie sale antes de tiempo
+        espera = self.pausa_hasta - time.monotonic()
+        if espera > 0:
+            await asyncio.sleep(espera)
+    
+    async def liberar(self, latencia, status, retry_after=None):
+        async with self._cond:
+            self.en_vuelo -= 1
+            self._ajustar(latencia, status, retry_after)
+            self._cond.notify_all()
+    
+    def _cambiar_limite(self, nuevo, motivo):
+        nuevo = max(self.minimo, min(self.maximo, nuevo))
+        if nuevo != self.limite:
+            logger.info("%s: concurrencia %d -> %d (%s)", self.tienda, self.limite, nuevo, motivo)
+            self.limite = nuevo
+    
+    def _ajustar(self, latencia, status, retry_after):
+        ahora = time.monotonic()
+        
+        if status is None or status == 429 or status >= 500:
+            if retry_after and retry_after > self.max_retry_after:
+                logger.warning("%s: Retry-After de %.0fs supera el máximo (%.0fs); no se pausa la tienda",
+                               self.tienda, retry_after, self.max_retry_after)
+            elif retry_after:
+                self.pausa_hasta = max(self.pausa_hasta, ahora + retry_after)
+                logger.info("%s: pausa de %.1fs por Retry-After", self.tienda, retry_after)
+            # Un solo recorte por ventana de latencia: las respuestas que ya estaban en vuelo no cuentan doble
+            if ahora - self._ultimo_recorte > max(latencia, 1.0):
+                self._ultimo_recorte = ahora
+                self._latencias = []
+                self._cambiar_limite(self.limite // 2, f"status {status or 'sin respuesta'}")
+            return
+        
+        self._latencias.append(latencia)
+        if len(self._latencias) < self.ventana:
+            return
+        
+        mediana = sorted(self._latencias)[len(self._latencias) // 2]
+        self._latencias = []
+        if mediana > self.latencia_objetivo * 2:
+            self._cambiar_limite(int(self.limite * 0.75), f"latencia mediana {mediana:.2f}s")
+        elif mediana < self.latencia_objetivo:
+            self._cambiar_limite(self.limite + 1, f"latencia mediana {mediana:.2f}s")
+
+def _trazas_aiohttp():
+    """TraceConfig que suma DNS y apertura de conexión (sin el DNS) al CronometroURL de cada request"""
+    import aiohttp
+    
+    def marcar(atributo):
+        async def hook(session, ctx, params):
+            setattr(ctx, atributo, time.perf_counter())
+        return hook
+    
+    def medir(fase, atributo, descontar=None):
+        async def hook(session, ctx, params):
+            cron = ctx.trace_request_ctx
+            if cron is None or not hasattr(ctx, atributo):
+                return
+            ms = (time.perf_counter() - getattr(ctx, atributo)) * 1000
+            if descontar:
+                ms -= getattr(ctx, descontar, 0.0)
+            setattr(ctx, f'{fase}_ms', ms)
+            cron.sumar(fase, ms)
+        return hook
+    
+    trazas = aiohttp.TraceConfig()
+    trazas.on_dns_resolvehost_start.append(marcar('inicio_dns'))
+    trazas.on_dns_resolvehost_end.append(medir('dns', 'inicio_dns'))
+    trazas.on_connection_create_start.append(marcar('inicio_conexion'))
+    # La resolución DNS ocurre dentro de la apertura de la conexión: no se cuenta dos veces
+    trazas.on_connection_create_end.append(medir('conexion', 'inicio_conexion', descontar='dns_ms'))
+    return trazas
+
+class MotorHTTPAsync:
+    """Descargas con aiohttp: un pool de conexiones keep-alive compartido y concurrencia adaptativa"""
+    
+    def __init__(self, scraper, control=None, max_total=MAX_CONEXIONES_TOTALES, max_reintentos=2, tuberia=None):
+        self.scraper = scraper
+        self.control = control or ControlConcurrencia.desde_config(scraper.tienda, scraper.config)
+        self.max_total = max_total
+        self.max_reintentos = max_reintentos
+        self.tuberia = tuberia
+        self._cupos = nullcontext()
+    
+    async def _descargar(self, session, url, cron):
+        """(status, motivo, contenido, error) con reintentos en 429/503"""
+        cache = self.scraper.cache
+        headers = {}
+        if cache:
+            # SQLite bloquea (y en "Todas" el lock es de todas las tiendas): fuera del loop, en un hilo
+            contenido, headers = await asyncio.to_thread(cache.consultar, url)
+            if contenido is not None:
+                cron.desde_cache = True
+                return 200, 'OK', contenido, None
+        
+        for intento in range(self.max_reintentos + 1):
+            with cron.fase('cola'):
+                await self.control.adquirir()
+            inicio = time.perf_counter()
+            status, motivo, contenido, retry_after, error = None, None, None, None, None
+            # dns/conexion los suman las trazas de aiohttp; respuesta es lo que queda hasta los headers
+            previo = cron.ms.get('dns', 0.0) + cron.ms.get('conexion', 0.0)
+            try:
+                async with session.get(url, headers=headers, trace_request_ctx=cron) as response:
+                    conexion = cron.ms.get('dns', 0.0) + cron.ms.get('conexion', 0.0) - previo
+                    cron.sumar('respuesta', (time.perf_counter() - inicio) * 1000 - conexion)
+                    inicio_cuerpo = time.perf_counter()
+                    status = response.status
+                    retry_after = _segundos_retry_after(response.headers.get('Retry-After'))
+                    motivo = response.reason
+                    lector = self.scraper.nuevo_lector()
+                    if lector and status == 200:
+                        async for bloque in response.content.iter_chunked(LectorParcial.TAMANO_BLOQUE):
+                            if lector.alimentar(bloque):
+                                response.close()
+                                break
+                        contenido = lector.contenido()
+                    else:
+                        contenido = await response.read()
+                    cron.sumar('descarga', (time.perf_counter() - inicio_cuerpo) * 1000)
+                    cron.bytes += len(contenido)
+                    # Un cuerpo cortado no se cachea: un 304 posterior repetiría la página incompleta
+                    if cache and not (lector and lector.cortado):
+                        status, contenido = await asyncio.to_thread(
+                            cache.actualizar, url, status, response.headers, contenido)
+            except Exception as e:
+                error = e
+            finally:
+                await self.control.liberar(time.perf_counter() - inicio, status, retry_after)
+            
+            # 429/503: el control ya bajó la concurrencia y respeta el Retry-After antes del reintento
+            if status not in (429, 503):
+                break
+            # Salvo que el sitio pida esperar más que el máximo: esa URL falla y el resto de la tienda sigue
+            if retry_after and retry_after > self.control.max_retry_after:
+                error = RuntimeError(f"Retry-After {retry_after:.0f}s > máx {self.control.max_retry_after:.0f}s")
+                break
+        
+        return status, motivo, contenido, error
+    
+    async def _procesar(self, url, status, motivo, contenido):
+        if self.tuberia is None:
+            return self.scraper.procesar_respuesta(url, status, motivo, contenido)
+        try:
+            return await asyncio.wrap_future(self.tuberia.parsear(url, status, motivo, contenido))
+        except Exception:
+            # Proceso de parseo caído: se parsea acá en vez de perder la URL
+            return self.scraper.procesar_respuesta(url, status, motivo, contenido)
+    
+    async def _scrapear_uno(self, session, idx, url):
+        cron = CronometroURL()
+        # Con tubería, el cupo cubre descarga + parseo: nunca hay más de N cuerpos HTML en memoria
+        async with self._cupos:
+            status, motivo, contenido, error = await self._descargar(session, url, cron)
+            
+            if error is not None:
+                if self.scraper.tienda == "Fravega":
+                    return idx, None
+                resultado = self.scraper._resultado_base(url, 'Error', f'❌ {str(error)[:30] or type(error).__name__}')
+                return idx, cron.volcar(resultado)
+            
+            return idx, cron.volcar(await self._procesar(url, status, motivo, contenido))
+    
+    async def ejecutar(self, trabajos, al_terminar):
+        """trabajos: lista de (idx, url). Llama al_terminar(idx, resultado) a medida que terminan"""
+        import aiohttp
+        
+        if self.tuberia is not None:
+            self._cupos = asyncio.Semaphore(self.control.maximo + self.tuberia.max_en_cola)
+        connector = aiohttp.TCPConnector(limit=self.max_total, limit_per_host=self.control.maximo, ttl_dns_cache=300)
+        timeout = aiohttp.ClientTimeout(total=15)
+        
+        async with aiohttp.ClientSession(connector=connector, timeout=timeout, headers=HEADERS_HTTP,
+                                         trace_configs=[_trazas_aiohttp()]) as session:
+            tareas = [asyncio.create_task(self._scrapear_uno(session, idx, url)) for idx, url in trabajos]
+            for tarea in asyncio.as_completed(tareas):
+                idx, resultado = await tarea
+                al_terminar(idx, resultado)
+
+class MotorFravegaAsync:
+    """Frávega concurrente: un solo Chromium (playwright.async_api) con N páginas a la vez"""
+    
+    def __init__(self, scraper, concurrencia=4):
+        self.scraper = scraper
+        self.concurrencia = max(1, int(concurrencia))
+        self.bloqueo_recursos = scraper.config.get('bloqueo_recursos')
+        self._browser = None
+        self._lock = None
+    
+    async def _enrutar(self, route):
+        request = route.request
+        if debe_bloquear_request(self.bloqueo_recursos, request.resource_type, request.url):
+            await route.abort()
+        else:
+            await route.continue_()
+    
+    async def _obtener_browser(self, p):
+        # Relanzar Chromium si se cayó; el lock evita que varias tareas lo relancen a la vez
+        async with self._lock:
+            if self._browser is None or not self._browser.is_connected():
+                self._browser = await p.chromium.launch(headless=True)
+            return self._browser
+    
+    async def _scrapear_uno(self, p, semaforo, idx, url):
+        cron = CronometroURL()
+        async with semaforo:
+            cron.sumar('cola', (time.perf_counter() - cron.inicio) * 1000)
+            try:
+                browser = await self._obtener_browser(p)
+                context = await browser.new_context(**OPCIONES_CONTEXTO_PLAYWRIGHT)
+                if self.bloqueo_recursos:
+                    await context.route("**/*", self._enrutar)
+            except Exception as e:
+                resultado = self.scraper._resultado_base(url, 'Error', f'❌ {str(e)[:40]}')
+                resultado['via'] = 'navegador'
+                return idx, cron.volcar(resultado)
+            
+            try:
+                resultado = await self.scraper.scrape_fravega_async(context, url, cron)
+            finally:
+                try:
+                    await context.close()
+                except Exception:
+                    pass
+            return idx, resultado
+    
+    async def ejecutar(self, trabajos, al_terminar):
+        """trabajos: lista de (idx, url). Llama al_terminar(idx, resultado) a medida que terminan"""
+        from playwright.async_api import async_playwright
+        
+        self._lock = asyncio.Lock()
+        semaforo = asyncio.Semaphore(self.concurrencia)
+        
+        async with async_playwright() as p:
+            try:
+                tareas = [asyncio.create_task(self._scrapear_uno(p, semaforo, idx, url))
+                          for idx, url in trabajos]
+                for tarea in asyncio.as_completed(tareas):
+                    idx, resultado = await tarea
+                    al_terminar(idx, resultado)
+            finally:
+                if self._browser is not None:
+                    try:
+                        await self._browser.close()
+                    except Exception:
+                        pass
+                    self._browser = None
+
+def contexto_procesos():
+    """Contexto para los procesos hijos: forkserver donde existe, si no spawn
+    
+    fork no: se llama desde el servidor de Streamlit (y desde un hilo por tienda), y hacer fork de un
+    proceso con hilos puede dejar al hijo trabado en un lock. Los targets viven en este módulo, así que
+    el hijo los importa sin pasar por el script de la UI.
+    """
+    if 'forkserver' in multiprocessing.get_all_start_methods():
+        ctx = multiprocessing.get_context('forkserver')
+        # El servidor importa el motor una vez; cada hijo nace de ahí sin volver a cargar pandas/lxml
+        ctx.set_forkserver_preload(['auditor'])
+        return ctx
+    return multiprocessing.get_context('spawn')
+
+def _proceso_fravega(shard_id, trabajos, tienda_config, cola):
+    """Proceso hijo: un Chromium propio para su shard; cada resultado vuelve por la cola"""
+    scraper = WebScraper(tienda_config, "Fravega")
+    motor = MotorFravegaAsync(scraper, tienda_config.get('max_paginas_concurrentes', 4))
+    asyncio.run(motor.ejecutar(trabajos, lambda idx, resultado: cola.put((shard_id, idx, resultado))))
+
+def calcular_shards_fravega(total, tienda_config):
+    """Cantidad de procesos navegador: uno por CPU, sin shards más chicos que min_urls_por_proceso"""
+    procesos = tienda_config.get('procesos_navegador') or os.cpu_count() or 1
+    por_proceso = max(1, tienda_config.get('min_urls_por_proceso', 100))
+    return max(1, min(procesos, -(-total // por_proceso)))
+
+def scrapear_fravega_multiproceso(trabajos, tienda_config, al_terminar, shards, max_reinicios=2):
+    """Reparte las URLs en shards, uno por proceso con su navegador, y reinicia los que mueren"""
+    ctx = contexto_procesos()
+    cola = ctx.Queue()
+    
+    pendientes = {}
+    for shard_id in range(shards):
+        shard = trabajos[shard_id::shards]
+        if shard:
+            pendientes[shard_id] = dict(shard)
+    
+    reinicios = {shard_id: 0 for shard_id in pendientes}
+    procesos = {}
+    
+    def lanzar(shard_id):
+        proceso = ctx.Process(
+            target=_proceso_fravega,
+            args=(shard_id, list(pendientes[shard_id].items()), tienda_config, cola),
+            daemon=True
+        )
+        proceso.start()
+        procesos[shard_id] = proceso
+    
+    def recibir(shard_id, idx, resultado):
+        if pendientes[shard_id].pop(idx, None) is not None:
+            al_terminar(idx, resultado)
+    
+    try:
+        for shard_id in pendientes:
+            lanzar(shard_id)
+        
+        while procesos:
+            try:
+                recibir(*cola.get(timeout=1))
+                continue
+            except queue.Empty:
+                pass
+            
+            for shard_id, proceso in list(procesos.items()):
+                if proceso.is_alive():
+                    continue
+                
+                # Vaciar lo que el proceso alcanzó a mandar antes de terminar
+                try:
+                    while True:
+                        recibir(*cola.get_nowait())
+                except queue.Empty:
+                    pass
+                
+                del procesos[shard_id]
+                if not pendientes[shard_id]:
+                    continue
+                
+                if reinicios[shard_id] < max_reinicios:
+                    reinicios[shard_id] += 1
+                    lanzar(shard_id)
+                else:
+                    scraper = WebScraper(tienda_config, "Fravega")
+                    for idx, url in list(pendientes[shard_id].items()):
+                        recibir(shard_id, idx, scraper._resultado_base(
+                            url, 'Error', f'❌ Proceso navegador caído (código {proceso.exitcode})'))
+    finally:
+        for proceso in procesos.values():
+            proceso.terminate()
+
+MIN_URLS_TUBERIA = 50
+
+_scraper_parseo = None
+
+def _iniciar_proceso_parseo(tienda_config, tienda_nombre):
+    global _scraper_parseo
+    _scraper_parseo = WebScraper(tienda_config, tienda_nombre)
+
+def _parsear_en_proceso(url, status, motivo, contenido):
+    """Etapa de parseo (proceso hijo): el mismo procesar_respuesta, con el extractor compilado del proceso"""
+    return _scraper_parseo.procesar_respuesta(url, status, motivo, contenido)
+
+class TuberiaParseo:
+    """Etapa de parseo en procesos: las descargas quedan en su hilo/loop y el HTML se parsea fuera de su GIL"""
+    
+    def __init__(self, scraper, procesos=None, max_en_cola=None):
+        self.scraper = scraper
+        self.procesos = max(1, procesos or os.cpu_count() or 1)
+        # Tope de HTML descargado esperando parseo: con la cola llena, las descargas esperan
+        self.max_en_cola = max_en_cola or self.procesos * 4
+        self._executor = ProcessPoolExecutor(
+            max_workers=self.procesos,
+            mp_context=contexto_procesos(),
+            initializer=_iniciar_proceso_parseo,
+            initargs=(scraper.config, scraper.tienda)
+        )
+    
+    @classmethod
+    def para(cls, scraper, total):
+        """Tubería para la auditoría, o None si no compensa (pocas URLs o un solo núcleo)"""
+        procesos = scraper.config.get('procesos_parseo') or os.cpu_count() or 1
+        if total < MIN_URLS_TUBERIA or procesos < 2:
+            return None
+        return cls(scraper, procesos)
+    
+    def parsear(self, url, status, motivo, contenido):
+        """Future con el resultado; si el pool se rompió, se parsea en este proceso"""
+        try:
+            return self._executor.submit(_parsear_en_proceso, url, status, motivo, contenido)
+        except Exception:
+            futuro = Future()
+            futuro.set_result(self.scraper.procesar_respuesta(url, status, motivo, contenido))
+            return futuro
+    
+    def resultado(self, futuro, url, status, motivo, contenido):
+        try:
+            return futuro.result()
+        except Exception:
+            # Proceso de parseo caído: se reintenta acá en vez de perder la URL
+            return self.scraper.procesar_respuesta(url, status, motivo, contenido)
+    
+    def cerrar(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+def descargar_en_hilos(scraper, trabajos, tuberia, al_terminar, hilos=5):
+    """Sin aiohttp: hilos de descarga -> cola acotada -> procesos de parseo; al_terminar corre en este hilo"""
+    cola = queue.Queue(maxsize=tuberia.max_en_cola)
+    # Si este hilo deja de consumir (al_terminar falló), los hilos de descarga no pueden quedar trabados en put
+    cancelado = threading.Event()
+    
+    def encolar(item):
+        while not cancelado.is_set():
+            try:
+                cola.put(item, timeout=0.2)
+                return
+            except queue.Full:
+                pass
+    
+    def descargar(idx, url):
+        if cancelado.is_set():
+            return
+        cron = CronometroURL()
+        try:
+            encolar((idx, url, scraper._descargar(url, cron), None, cron))
+        except Exception as e:
+            encolar((idx, url, None, e, cron))
+    
+    en_parseo = {}
+    
+    def entregar(listos):
+        for futuro in listos:
+            idx, url, respuesta, cron = en_parseo.pop(futuro)
+            al_terminar(idx, cron.volcar(tuberia.resultado(futuro, url, *respuesta)))
+    
+    with ThreadPoolExecutor(max_workers=hilos) as executor:
+        try:
+            for idx, url in trabajos:
+                executor.submit(descargar, idx, url)
+            
+            for _ in range(len(trabajos)):
+                idx, url, respuesta, error, cron = cola.get()
+                if error is not None:
+                    al_terminar(idx, cron.volcar(scraper._resultado_base(url, 'Error', f'❌ {str(error)[:30]}')))
+                    continue
+                
+                en_parseo[tuberia.parsear(url, *respuesta)] = (idx, url, respuesta, cron)
+                entregar([f for f in list(en_parseo) if f.done()])
+                if len(en_parseo) >= tuberia.max_en_cola:
+                    # Parseo saturado: no sacar más de la cola hasta que se libere lugar
+                    entregar(wait(en_parseo, return_when=FIRST_COMPLETED).done)
+            
+            entregar(list(en_parseo))
+        finally:
+            # En el camino normal ya no queda nada; con un error, las descargas pendientes no arrancan
+            # y las que están en curso terminan sin esperar lugar en la cola
+            cancelado.set()
+            executor.shutdown(cancel_futures=True)
+
+# Parámetros de campañas/analytics: no cambian la página que devuelve la tienda. Solo utm_ va por prefijo;
+# el resto por nombre exacto (con startswith, '_ga' también se comería un '_galeria' legítimo)
+PREFIJOS_SEGUIMIENTO = ('utm_',)
+PARAMETROS_SEGUIMIENTO = frozenset({'gclid', 'gbraid', 'wbraid', 'fbclid', 'msclkid', 'yclid', 'mc_cid', 'mc_eid',
+                                    '_ga', '_gl', 'srsltid', 'gad_source', 'igshid'})
+
+def es_parametro_seguimiento(nombre):
+    nombre = nombre.lower()
+    return nombre in PARAMETROS_SEGUIMIENTO or nombre.startswith(PREFIJOS_SEGUIMIENTO)
+
+def canonizar_url(url):
+    """Clave que comparten las URLs de una misma página: sin tracking, fragmento, puerto por defecto ni barra final"""
+    url = str(url).strip()
+    try:
+        partes = urlsplit(url)
+        puerto = partes.port
+    except ValueError:
+        return url
+    
+    esquema = partes.scheme.lower()
+    host = (partes.hostname or '').lower()
+    if ':' in host:
+        host = f'[{host}]'
+    if puerto and (esquema, puerto) not in (('http', 80), ('https', 443)):
+        host = f'{host}:{puerto}'
+    
+    ruta = re.sub(r'/{2,}', '/', partes.path).rstrip('/') or '/'
+    query = sorted((k, v) for k, v in parse_qsl(partes.query, keep_blank_values=True)
+                   if not es_parametro_seguimiento(k))
+    return urlunsplit((esquema, host, ruta, urlencode(query), ''))
+
+def descargas_ahorradas(urls):
+    """Cuántas filas reutilizan la descarga de otra por apuntar a la misma URL canónica"""
+    urls = [url for url in urls if pd.notna(url)]
+    return len(urls) - len({canonizar_url(url) for url in urls})
+
+def avisar_progreso(progreso, completados, total):
+    """Llama al callback de progreso; si falla se loguea, nunca se cuenta como error del scraping"""
+    if not progreso:
+        return
+    try:
+        progreso(completados, total)
+    except Exception:
+        logger.warning("El callback de progreso falló", exc_info=True)
+
+def realizar_scraping(df_tienda, tienda_config, tienda_nombre, progreso=None, cache=None, checkpoint=None):
+    """Escanea las URLs de df_tienda; progreso(completados, total) se llama con cada resultado"""
+    scraper = WebScraper(tienda_config, tienda_nombre, cache=cache)
+    resultados = []
+    
+    trabajos = [(idx, row['url']) for idx, row in df_tienda.iterrows() if pd.notna(row.get('url'))]
+    total = len(trabajos)
+    url_de = dict(trabajos)
+    # idx que se escanea -> todas las filas que comparten su URL canónica
+    copias = {}
+    
+    def registrar(idx, resultado, guardar=True):
+        for destino in copias.get(idx, (idx,)):
+            copia = resultado if destino == idx else {
+                k: v for k, v in dict(resultado, url=url_de[destino]).items() if k not in CLAVES_MEDICION}
+            copia['idx'] = destino
+            resultados.append(copia)
+            if checkpoint and guardar:
+                checkpoint.guardar(tienda_nombre, url_de[destino], copia)
+        
+        avisar_progreso(progreso, len(resultados), total)
+    
+    if checkpoint:
+        # Reanudación: lo que ya tiene estado final en el checkpoint no se vuelve a escanear
+        previos = checkpoint.previos(tienda_nombre)
+        pendientes = []
+        for idx, url in trabajos:
+            if url in previos:
+                registrar(idx, dict(previos[url]), guardar=False)
+            else:
+                pendientes.append((idx, url))
+        trabajos = pendientes
+    
+    # Una descarga por página: las URLs equivalentes (tracking, barra final, mayúsculas del host) se agrupan
+    unicos = {}
+    for idx, url in trabajos:
+        unicos.setdefault(canonizar_url(url), []).append(idx)
+    trabajos = [(grupo[0], url_de[grupo[0]]) for grupo in unicos.values()]
+    copias = {grupo[0]: grupo for grupo in unicos.values() if len(grupo) > 1}
+    if copias:
+        logger.info("%s: %d URLs únicas para %d filas", tienda_nombre, len(trabajos), sum(map(len, unicos.values())))
+    
+    concurrencia_fravega = tienda_config.get('max_paginas_concurrentes', 1)
+    # Sin aiohttp: hilos de descarga (requests)
+    hilos = tienda_config.get('hilos_descarga', 5)
+    control = ControlConcurrencia.desde_config(tienda_nombre, tienda_config)
+    tuberia = TuberiaParseo.para(scraper, total)
+    
+    try:
+        if tienda_nombre == "Fravega":
+            trabajos_navegador = trabajos
+            if tienda_config.get('http_primero'):
+                # Pasada HTTP: lo que no se resuelve con el HTML del servidor va al navegador
+                trabajos_navegador = []
+                urls = dict(trabajos)
+                
+                def registrar_http(idx, resultado):
+                    if resultado:
+                        registrar(idx, resultado)
+                    else:
+                        trabajos_navegador.append((idx, urls[idx]))
+                
+                if AIOHTTP_AVAILABLE:
+                    validos = []
+                    for idx, url in trabajos:
+                        error = scraper._validar_url_fravega(url)
+                        if error:
+                            registrar(idx, error)
+                        else:
+                            validos.append((idx, url))
+                    asyncio.run(MotorHTTPAsync(scraper, control, tuberia=tuberia).ejecutar(validos, registrar_http))
+                else:
+                    with ThreadPoolExecutor(max_workers=hilos) as executor:
+                        futures = {executor.submit(scraper.scrape_fravega_http, url): idx for idx, url in trabajos}
+                        
+                        for future in as_completed(futures):
+                            registrar_http(futures[future], future.result())
+            
+            shards = calcular_shards_fravega(len(trabajos_navegador), tienda_config)
+            
+            if not PLAYWRIGHT_AVAILABLE:
+                for idx, url in trabajos_navegador:
+                    registrar(idx, scraper._resultado_base(url, 'Error', '❌ Playwright no disponible'))
+            elif shards > 1:
+                # Catálogos grandes: un proceso (y un Chromium) por CPU
+                scrapear_fravega_multiproceso(trabajos_navegador, tienda_config, registrar, shards)
+            elif concurrencia_fravega > 1:
+                # Playwright sync no es thread-safe: la concurrencia va por asyncio en un solo hilo
+                motor = MotorFravegaAsync(scraper, concurrencia_fravega)
+                asyncio.run(motor.ejecutar(trabajos_navegador, registrar))
+            else:
+                # Secuencial con el navegador persistente del scraper
+                for idx, url in trabajos_navegador:
+                    registrar(idx, scraper.scrape_fravega_con_playwright(url))
+        elif AIOHTTP_AVAILABLE:
+            # Cientos de requests en vuelo sobre un pool compartido, con tope por host
+            asyncio.run(MotorHTTPAsync(scraper, control, tuberia=tuberia).ejecutar(trabajos, registrar))
+        elif tuberia is not None:
+            descargar_en_hilos(scraper, trabajos, tuberia, registrar, hilos)
+        else:
+            # Sin aiohttp, usar ThreadPool
+            with ThreadPoolExecutor(max_workers=hilos) as executor:
+                futures = {executor.submit(scraper.scrape_url, url): idx for idx, url in trabajos}
+                
+                for future in as_completed(futures):
+                    registrar(futures[future], future.result())
+    finally:
+        # Un solo Chromium por auditoría: se cierra al terminar, incluso si hubo error
+        scraper.cerrar()
+        if tuberia is not None:
+            tuberia.cerrar()
+    
+    return resultados
+
+# Opción "todas las tiendas": un solo maestro, todas las tiendas con columnas detectadas, un reporte combinado
+TODAS_LAS_TIENDAS = "Todas"
+
+def detectar_columnas_tiendas(df_maestro):
+    """{tienda: columnas detectadas} para las tiendas que tienen URL, SKU y precio en el maestro"""
+    columnas = {}
+    for tienda in TIENDAS_CONFIG:
+        detectadas = detectar_columnas_automaticamente(df_maestro, tienda)
+        if detectadas['url'] and detectadas['sku'] and detectadas['precio']:
+            columnas[tienda] = detectadas
+    return columnas
+
+def preparar_dfs_tiendas(df_maestro, columnas_tiendas, max_productos=None):
+    """{tienda: df_tienda} a partir de un único maestro ya leído"""
+    return {
+        tienda: preparar_df_tienda(df_maestro, cols['url'], cols['sku'], cols['precio'],
+                                   cols['cuotas'] if tienda in ["Fravega", "Megatone"] else None, max_productos)
+        for tienda, cols in columnas_tiendas.items()
+    }
+
+def realizar_scraping_tiendas(dfs_tiendas, progreso=None, cache=None, checkpoint=None):
+    """Escanea varias tiendas a la vez, cada una con sus propios límites; devuelve {tienda: resultados}
+    
+    Cada tienda corre realizar_scraping en su hilo (su loop asyncio, su ControlConcurrencia y su navegador),
+    así que la duración total tiende a la de la tienda más lenta y no a la suma. progreso(completados, total)
+    recibe el avance de todas juntas y se llama siempre desde el hilo que invoca esta función (Streamlit
+    solo deja tocar la UI desde el hilo del script).
+    """
+    total = sum(len(df) for df in dfs_tiendas.values())
+    avance = {tienda: 0 for tienda in dfs_tiendas}
+    # Los hilos de las tiendas solo encolan su avance; el hilo llamador lo drena y llama a progreso
+    avisos = queue.Queue()
+    
+    def progreso_tienda(tienda):
+        def actualizar(completados, _total):
+            avisos.put((tienda, completados))
+        return actualizar
+    
+    def drenar_avisos():
+        hubo = False
+        while True:
+            try:
+                tienda, completados = avisos.get_nowait()
+            except queue.Empty:
+                break
+            avance[tienda] = max(avance[tienda], completados)
+            hubo = True
+        if hubo:
+            avisar_progreso(progreso, sum(avance.values()), total)
+    
+    # Las tuberías de parseo se reparten los núcleos en vez de pedir cada una todos
+    procesos = max(1, (os.cpu_count() or 1) // max(1, len(dfs_tiendas)))
+    
+    def escanear(tienda):
+        config = dict(TIENDAS_CONFIG[tienda])
+        config.setdefault('procesos_parseo', procesos)
+        return realizar_scraping(dfs_tiendas[tienda], config, tienda,
+                                 progreso=progreso_tienda(tienda), cache=cache, checkpoint=checkpoint)
+    
+    resultados = {}
+    with ThreadPoolExecutor(max_workers=max(1, len(dfs_tiendas)), thread_name_prefix='tienda') as executor:
+        futures = {executor.submit(escanear, tienda): tienda for tienda in dfs_tiendas}
+        en_curso = set(futures)
+        while en_curso:
+            listos, en_curso = wait(en_curso, timeout=0.2, return_when=FIRST_COMPLETED)
+            drenar_avisos()
+            for future in listos:
+                tienda = futures[future]
+                try:
+                    resultados[tienda] = future.result()
+                except Exception as e:
+                    # Una tienda caída no tira abajo la auditoría del resto
+                    logger.exception("%s: la auditoría falló", tienda)
+                    scraper = WebScraper(TIENDAS_CONFIG[tienda], tienda)
+                    resultados[tienda] = []
+                    for idx, url in dfs_tiendas[tienda]['url'].items():
+                        resultado = scraper._resultado_base(url, 'Error', f'❌ {str(e)[:30] or type(e).__name__}')
+                        resultado['idx'] = idx
+                        resultados[tienda].append(resultado)
+    
+    return resultados
+
+def combinar_tiendas(dfs_resultados):
+    """Un solo reporte con la columna 'tienda' a partir de {tienda: df ya validado}"""
+    partes = [df.assign(tienda=tienda) for tienda, df in dfs_resultados.items()]
+    if not partes:
+        return pd.DataFrame(columns=['tienda'])
+    combinado = pd.concat(partes, ignore_index=True)
+    return combinado[['tienda'] + [col for col in combinado.columns if col != 'tienda']]
+
+PERCENTILES_LATENCIA = (50, 90, 95, 99)
+
+def tabla_rendimiento(resultados_tiendas):
+    """Una fila por URL descargada en esta corrida: tienda, fases (ms), bytes, total y momento de fin"""
+    medidas = [f'{fase}_ms' for fase in FASES_URL] + ['total_ms', 'bytes', 'fin']
+    filas = [
+        [tienda, r.get('url'), r.get('estado_producto'), bool(r.get('desde_cache'))] + [r.get(col) for col in medidas]
+        for tienda, resultados in resultados_tiendas.items() for r in resultados if 'total_ms' in r
+    ]
+    df = pd.DataFrame(filas, columns=['tienda', 'url', 'estado_producto', 'desde_cache'] + medidas)
+    df[medidas] = df[medidas].astype('float64')
+    return df
+
+def vias_resolucion(resultados_tiendas):
+    """{'http': n, 'navegador': m} de lo descargado en esta corrida: sin checkpoint, historial ni filas copiadas"""
+    vias = {}
+    for resultados in resultados_tiendas.values():
+        for r in resultados:
+            if 'total_ms' in r and r.get('via'):
+                vias[r['via']] = vias.get(r['via'], 0) + 1
+    return vias
+
+def throughput_rendimiento(df_rendimiento, ventanas=60):
+    """URLs terminadas por segundo y por tienda, en unas `ventanas` ventanas desde el arranque de la auditoría"""
+    if df_rendimiento.empty:
+        return pd.DataFrame(columns=['segundo', 'tienda', 'urls', 'urls_por_s'])
+    inicio = (df_rendimiento['fin'] - df_rendimiento['total_ms'] / 1000).min()
+    paso = max(1.0, float(np.ceil((df_rendimiento['fin'].max() - inicio) / ventanas)))
+    segundo = ((df_rendimiento['fin'] - inicio) // paso * paso).rename('segundo')
+    serie = df_rendimiento.groupby([segundo, 'tienda'], sort=True).size().rename('urls').reset_index()
+    serie['urls_por_s'] = serie['urls'] / paso
+    return serie
+
+def _percentiles(serie):
+    serie = serie.dropna()
+    if serie.empty:
+        return None
+    valores = {f'p{p}': round(float(np.percentile(serie, p)), 1) for p in PERCENTILES_LATENCIA}
+    valores['max'] = round(float(serie.max()), 1)
+    return valores
+
+def resumen_rendimiento(df_rendimiento, lentas=10):
+    """Percentiles de latencia y de cada fase, throughput en el tiempo y URLs más lentas, por tienda"""
+    resumen = {'generado': datetime.now().isoformat(timespec='seconds'), 'urls': len(df_rendimiento), 'tiendas': {}}
+    if df_rendimiento.empty:
+        return resumen
+    
+    inicio = (df_rendimiento['fin'] - df_rendimiento['total_ms'] / 1000).min()
+    duracion = max(float(df_rendimiento['fin'].max() - inicio), 1e-3)
+    resumen['duracion_s'] = round(duracion, 2)
+    resumen['urls_por_s'] = round(len(df_rendimiento) / duracion, 2)
+    
+    for tienda, grupo in df_rendimiento.groupby('tienda', sort=False):
+        resumen['tiendas'][tienda] = {
+            'urls': len(grupo),
+            'desde_cache': int(grupo['desde_cache'].sum()),
+            'errores': int((grupo['estado_producto'] == 'Error').sum()),
+            'bytes': int(grupo['bytes'].sum()),
+            'latencia_ms': _percentiles(grupo['total_ms']),
+            'fases_ms': {fase: _percentiles(grupo[f'{fase}_ms']) for fase in FASES_URL
+                         if grupo[f'{fase}_ms'].notna().any()},
+            'mas_lentas': grupo.nlargest(lentas, 'total_ms')[['url', 'total_ms', 'estado_producto']].to_dict('records'),
+        }
+    
+    resumen['throughput'] = throughput_rendimiento(df_rendimiento).to_dict('records')
+    return resumen
+
+def exportar_rendimiento(df_rendimiento):
+    """Resumen de rendimiento como JSON (bytes) para el monitoreo"""
+    return json.dumps(resumen_rendimiento(df_rendimiento), ensure_ascii=False, indent=2, default=str).encode('utf-8')
+
+# Columnas que aporta el scraping, con su tipo: un solo join en vez de un .loc por celda
+COLUMNAS_RESULTADO = {
+    'titulo': 'object',
+    'precio_web': 'float64',
+    'precio_tachado': 'float64',
+    'descuento_%': 'float64',
+    'categoria': 'object',
+    'cuotas': 'float64',
+    'estado_producto': 'object',
+    'estado_scraping': 'object',
+    'via': 'object',
+    'edad_h': 'float64',
+}
+# Solo se agregan si algún resultado las trae (Frávega / auditoría delta)
+COLUMNAS_OPCIONALES = ('via', 'edad_h')
+
+def combinar_resultados(df_tienda, resultados):
+    """Une los resultados del scraping (dicts con 'idx') al maestro de la tienda en una sola operación"""
+    columnas = [col for col in COLUMNAS_RESULTADO
+                if col not in COLUMNAS_OPCIONALES or any(col in r for r in resultados)]
+    
+    df_resultados = pd.DataFrame(
+        {col: pd.Series([r.get(col) for r in resultados], dtype=COLUMNAS_RESULTADO[col]) for col in columnas}
+    )
+    df_resultados.index = pd.Index([r['idx'] for r in resultados])
+    
+    # El scraping manda sobre columnas homónimas que pudiera traer el maestro
+    return df_tienda.drop(columns=columnas, errors='ignore').join(df_resultados)
+
+def calcular_validaciones(df_tienda, umbral, validar_cuotas):
+    """Variación contra el maestro, precio_ok y cuotas_correctas (None donde no se puede validar)"""
+    df_tienda = df_tienda.copy()
+    activo = df_tienda['estado_producto'] == 'Activo'
+    precio_maestro = pd.to_numeric(df_tienda['precio_maestro'], errors='coerce')
+    
+    # Calcular variación solo para activos con precio
+    mask = df_tienda['precio_web'].notna() & (precio_maestro > 0) & activo
+    variacion = ((df_tienda['precio_web'] - precio_maestro) / precio_maestro * 100).round(2)
+    df_tienda['variacion_precio_%'] = variacion.where(mask)
+    
+    # Precio OK solo si hay precio Y está en rango
+    df_tienda['precio_ok'] = pd.Series(np.where(mask, variacion.abs() <= umbral, None),
+                                       index=df_tienda.index, dtype=object)
+    
+    # Cuotas OK solo si ambas existen
+    df_tienda['cuotas_correctas'] = None
+    if validar_cuotas and 'cuotas_maestro' in df_tienda.columns:
+        mask_c = df_tienda['cuotas'].notna() & df_tienda['cuotas_maestro'].notna() & activo
+        df_tienda['cuotas_correctas'] = pd.Series(np.where(mask_c, df_tienda['cuotas'] == df_tienda['cuotas_maestro'], None),
+                                                  index=df_tienda.index, dtype=object)
+    
+    return df_tienda
+
+COLUMNAS_EXPORTACION = [
+    ('tienda', 'Tienda'), ('sku', 'SKU'), ('titulo', 'Título'), ('precio_maestro', 'Precio Maestro'), ('precio_web', 'Precio Web'),
+    ('precio_tachado', 'Precio Tachado'), ('descuento_%', 'Descuento %'), ('variacion_precio_%', 'Variación %'),
+    ('precio_ok', 'Precio OK'), ('cuotas_maestro', 'Cuotas Maestro'), ('cuotas', 'Cuotas Web'),
+    ('cuotas_correctas', 'Cuotas OK'), ('categoria', 'Categoría'), ('estado_producto', 'Estado'),
+    ('estado_scraping', 'Scraping'), ('url', 'URL'),
+]
+COLUMNAS_CUOTAS = ('cuotas_maestro', 'cuotas', 'cuotas_correctas')
+
+def tabla_exportacion(df_results, tienda):
+    """Columnas del reporte ya armadas (Sí/No/-, celdas vacías en vez de NaN), sin recorrer fila por fila"""
+    con_cuotas = tienda in ["Fravega", "Megatone", TODAS_LAS_TIENDAS]
+    tabla = {}
+    for col, encabezado in COLUMNAS_EXPORTACION:
+        if col in COLUMNAS_CUOTAS and not con_cuotas:
+            continue
+        if col == 'tienda' and col not in df_results.columns:
+            continue
+        valores = df_results[col] if col in df_results.columns else pd.Series(None, index=df_results.index, dtype=object)
+        if col in ('precio_ok', 'cuotas_correctas'):
+            valores = pd.Series(np.where(valores == True, 'Sí', np.where(valores == False, 'No', '-')), index=df_results.index)
+        tabla[encabezado] = valores
+    
+    tabla = pd.DataFrame(tabla).astype(object)
+    return tabla.where(tabla.notna(), None)
+
+def crear_excel_formateado(df_results, tienda):
+    from openpyxl import Workbook
+    from openpyxl.cell import WriteOnlyCell
+    from openpyxl.styles import Font, PatternFill
+    from openpyxl.utils import get_column_letter
+    
+    # write_only: las filas se escriben en streaming al archivo, sin armar el modelo de celdas en memoria
+    output = BytesIO()
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet("Resultados")
+    
+    tabla = tabla_exportacion(df_results, tienda)
+    columnas = list(tabla.columns)
+    
+    # Ajustar ancho de columnas (en write_only tiene que ir antes de las filas)
+    for idx in range(1, len(columnas) + 1):
+        ws.column_dimensions[get_column_letter(idx)].width = 15
+    ws.merged_cells.add(f'A1:{get_column_letter(len(columnas))}1')
+    
+    titulo = WriteOnlyCell(ws, value=f'AUDITORÍA {tienda.upper()} - {datetime.now().strftime("%d/%m/%Y %H:%M")}')
+    titulo.font = Font(bold=True, size=14)
+    ws.append([titulo])
+    ws.append([])
+    
+    encabezados = []
+    for columna in columnas:
+        cell = WriteOnlyCell(ws, value=columna)
+        cell.font = Font(bold=True, color="FFFFFF")
+        cell.fill = PatternFill(start_color="667EEA", end_color="667EEA", fill_type="solid")
+        encabezados.append(cell)
+    ws.append(encabezados)
+    
+    for fila in tabla.itertuples(index=False, name=None):
+        ws.append(fila)
+    
+    wb.save(output)
+    output.seek(0)
+    return output
+
+def _tabla_parquet(df):
+    """Parquet necesita un tipo por columna: las columnas object mezcladas (SKU número/texto) van como texto"""
+    df = df.copy()
+    for col in df.columns:
+        if df[col].dtype == object and pd.api.types.infer_dtype(df[col]) not in ('string', 'boolean', 'empty'):
+            df[col] = df[col].map(lambda v: None if v is None or (isinstance(v, float) and np.isnan(v)) else str(v))
+    return df
+
+FORMATOS_EXPORTACION = ('xlsx', 'csv', 'parquet')
+
+def exportar_resultados(df_results, tienda, formato):
+    """Bytes del reporte en xlsx, csv o parquet"""
+    if formato == 'xlsx':
+        return crear_excel_formateado(df_results, tienda).getvalue()
+    if formato == 'csv':
+        return df_results.to_csv(index=False).encode('utf-8')
+    if formato == 'parquet':
+        output = BytesIO()
+        _tabla_parquet(df_results).to_parquet(output, index=False)
+        return output.getvalue()
+    raise ValueError(f"Formato de exportación desconocido: {formato}")
+
+def _mostrar_progreso(completados, total):
+    if completados == total or completados % 25 == 0:
+        print(f"\rEscaneando {completados}/{total}...", end='' if completados < total else '\n',
+              file=sys.stderr, flush=True)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Auditoría de precios sin interfaz: maestro -> reporte")
+    parser.add_argument('maestro', help=f"Maestro ({', '.join(FORMATOS_MAESTRO)})")
+    parser.add_argument('--tienda', required=True, choices=list(TIENDAS_CONFIG) + [TODAS_LAS_TIENDAS],
+                        help=f"Tienda a auditar, o {TODAS_LAS_TIENDAS} para todas las que tengan columnas en el maestro")
+    parser.add_argument('--umbral', type=float, default=5, help="Tolerancia de precio en %% (default: 5)")
+    parser.add_argument('--salida', help="Reporte .xlsx, .csv o .parquet (default: Auditoria_<tienda>_<fecha>.xlsx)")
+    parser.add_argument('--max-productos', type=int, help="Tope de productos por tienda")
+    parser.add_argument('--col-url')
+    parser.add_argument('--col-sku')
+    parser.add_argument('--col-precio')
+    parser.add_argument('--col-cuotas')
+    parser.add_argument('--sin-cache', action='store_true', help="No usar la cache HTTP en disco")
+    parser.add_argument('--cache-horas', type=float, default=8)
+    parser.add_argument('--reanudar', action='store_true', help="Retomar la última auditoría interrumpida de este maestro")
+    parser.add_argument('--reanudar-horas', type=float, default=8,
+                        help="Solo reanudar auditorías que empezaron hace menos de estas horas (default: 8)")
+    parser.add_argument('--delta-horas', type=float,
+                        help="Auditoría delta: reutilizar resultados sin cambios de hasta estas horas")
+    parser.add_argument('--metricas', help="Guardar en este JSON los tiempos por fase, percentiles y throughput")
+    args = parser.parse_args(argv)
+    
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s %(levelname)s %(message)s')
+    tienda = args.tienda
+    
+    # El formato se valida antes de escanear: no tiene sentido descubrirlo al final de la auditoría
+    salida = args.salida or f"Auditoria_{tienda}_{datetime.now().strftime('%Y%m%d_%H%M')}.xlsx"
+    formato = os.path.splitext(salida)[1].lstrip('.').lower() or 'xlsx'
+    if formato not in FORMATOS_EXPORTACION:
+        parser.error(f"--salida: formato .{formato} no soportado (usar {', '.join(FORMATOS_EXPORTACION)})")
+    if formato == 'parquet' and not PARQUET_AVAILABLE:
+        parser.error("--salida .parquet requiere pyarrow (pip install pyarrow)")
+    
+    try:
+        df_maestro = leer_maestro(args.maestro)
+    except ValueError as e:
+        parser.error(str(e))
+    
+    if tienda == TODAS_LAS_TIENDAS:
+        columnas_tiendas = detectar_columnas_tiendas(df_maestro)
+        if not columnas_tiendas:
+            parser.error(f"Ninguna tienda tiene columnas de URL, SKU y precio en el maestro. "
+                         f"Columnas: {', '.join(map(str, df_maestro.columns))}")
+        logger.info("Tiendas detectadas en el maestro: %s", ', '.join(columnas_tiendas))
+        dfs = preparar_dfs_tiendas(df_maestro, columnas_tiendas, args.max_productos)
+    else:
+        detectadas = detectar_columnas_automaticamente(df_maestro, tienda)
+        con_cuotas = tienda in ["Fravega", "Megatone"]
+        url_column = args.col_url or detectadas['url']
+        sku_column = args.col_sku or detectadas['sku']
+        precio_column = args.col_precio or detectadas['precio']
+        cuotas_column = (args.col_cuotas or detectadas['cuotas']) if con_cuotas else None
+        
+        faltantes = [nombre for nombre, col in [('url', url_column), ('sku', sku_column), ('precio', precio_column)] if not col]
+        if faltantes:
+            parser.error(f"No se detectaron las columnas {', '.join(faltantes)}; indicarlas con --col-*. "
+                         f"Columnas del maestro: {', '.join(map(str, df_maestro.columns))}")
+        
+        dfs = {tienda: preparar_df_tienda(df_maestro, url_column, sku_column, precio_column, cuotas_column,
+                                          args.max_productos)}
+    
+    cache = None if args.sin_cache else CacheHTTP(ttl_s=args.cache_horas * 3600)
+    historial = HistorialAuditorias()
+    try:
+        dfs_escanear, reusados = dict(dfs), {t: [] for t in dfs}
+        if args.delta_horas is not None:
+            for t, df_t in dfs.items():
+                a_escanear, reusados[t] = historial.plan_delta(t, df_t, args.delta_horas * 3600)
+                dfs_escanear[t] = df_t[a_escanear]
+            logger.info("Delta: %d para escanear, %d tomados del historial",
+                        sum(map(len, dfs_escanear.values())), sum(map(len, reusados.values())))
+        
+        checkpoint = CheckpointAuditoria([(t, url) for t, df_t in dfs_escanear.items() for url in df_t['url']],
+                                         reanudar=args.reanudar, vigencia_s=args.reanudar_horas * 3600)
+        if checkpoint.reanudada:
+            logger.info("Reanudando la auditoría interrumpida hace %.1f h", checkpoint.edad_h)
+        try:
+            inicio = time.perf_counter()
+            resultados = realizar_scraping_tiendas(dfs_escanear, progreso=_mostrar_progreso,
+                                                   cache=cache, checkpoint=checkpoint)
+            checkpoint.finalizar()
+            ahorradas = sum(descargas_ahorradas(df_t['url']) for df_t in dfs_escanear.values())
+            logger.info("%d URLs en %.1f s (%d descargas ahorradas por URLs repetidas)",
+                        sum(map(len, resultados.values())), time.perf_counter() - inicio, ahorradas)
+            vias = vias_resolucion(resultados)
+            if vias:
+                logger.info("Resueltos por HTTP: %d | con navegador: %d", vias.get('http', 0), vias.get('navegador', 0))
+        finally:
+            checkpoint.cerrar()
+        
+        for t, resultados_t in resultados.items():
+            historial.guardar(t, dfs[t], resultados_t)
+    finally:
+        historial.cerrar()
+        if cache:
+            cache.cerrar()
+    
+    dfs_resultados = {
+        t: calcular_validaciones(combinar_resultados(dfs[t], resultados[t] + reusados[t]),
+                                 args.umbral, t in ["Fravega", "Megatone"])
+        for t in dfs
+    }
+    df_resultados = combinar_tiendas(dfs_resultados) if tienda == TODAS_LAS_TIENDAS else dfs_resultados[tienda]
+    
+    # Los bytes se arman antes de abrir el archivo: si algo falla no queda un reporte vacío
+    reporte = exportar_resultados(df_resultados, tienda, formato)
+    with open(salida, 'wb') as f:
+        f.write(reporte)
+    
+    for t, df_t in dfs_resultados.items():
+        ok = (df_t['precio_ok'] == True).sum()
+        error_precio = (df_t['precio_ok'] == False).sum()
+        errores = (df_t['estado_producto'] == 'Error').sum()
+        print(f"{t}: {len(df_t)} productos | precio OK {ok} | error de precio {error_precio} | "
+              f"errores técnicos {errores}")
+    print(f"Reporte: {salida}")
+    
+    if args.metricas:
+        metricas = exportar_rendimiento(tabla_rendimiento(resultados))
+        with open(args.metricas, 'wb') as f:
+            f.write(metricas)
+        print(f"Métricas: {args.metricas}")
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
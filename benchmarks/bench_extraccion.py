@@ -0,0 +1,61 @@
+"""Micro-benchmark de extracción HTML: páginas por segundo por núcleo, backend bs4 vs lxml.
+
+Usa las páginas guardadas en benchmarks/fixtures (<tienda>.html y variantes <tienda>_<caso>.html, por ejemplo
+sin <meta charset>) y mide tiempo de CPU (un solo hilo), así que el número es directamente páginas/segundo/núcleo.
+
+    python benchmarks/bench_extraccion.py --repeticiones 200
+"""
+import argparse
+import os
+import sys
+import time
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+
+from auditor import TIENDAS_CONFIG, EXTRACTORES_HTML  # noqa: E402
+
+FIXTURES = os.path.join(RAIZ, 'benchmarks', 'fixtures')
+
+
+def paginas_por_segundo(extractor, contenido, repeticiones):
+    inicio = time.process_time()
+    for _ in range(repeticiones):
+        extractor.extraer(contenido)
+    return repeticiones / max(time.process_time() - inicio, 1e-9)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--repeticiones', type=int, default=200)
+    args = parser.parse_args()
+
+    backends = list(EXTRACTORES_HTML)
+    print(f"{'Página':<16} {'KB':>6} " + ' '.join(f'{b + " pág/s":>12}' for b in backends) + '   aceleración')
+
+    # Frávega se extrae con su propio camino (JSON-LD / Playwright), no con estos backends
+    tiendas = {tienda.lower(): tienda for tienda in TIENDAS_CONFIG if tienda != 'Fravega'}
+    for archivo in sorted(os.listdir(FIXTURES)):
+        nombre, extension = os.path.splitext(archivo)
+        tienda = tiendas.get(nombre.split('_')[0])
+        if extension != '.html' or not tienda:
+            continue
+        with open(os.path.join(FIXTURES, archivo), 'rb') as f:
+            contenido = f.read()
+
+        extractores = {b: EXTRACTORES_HTML[b](TIENDAS_CONFIG[tienda]) for b in backends}
+
+        # Los backends tienen que ser intercambiables: mismo resultado sobre la misma página
+        datos = {b: e.extraer(contenido) for b, e in extractores.items()}
+        if len({repr(sorted(d.items())) for d in datos.values()}) != 1:
+            print(f'{nombre}: los backends difieren -> {datos}')
+
+        velocidades = {b: paginas_por_segundo(e, contenido, args.repeticiones) for b, e in extractores.items()}
+        aceleracion = velocidades.get('lxml', 0) / velocidades['bs4'] if 'lxml' in velocidades else 1.0
+        print(f'{nombre:<16} {len(contenido) / 1024:>6.1f} '
+              + ' '.join(f'{velocidades[b]:>12.1f}' for b in backends)
+              + f'   x{aceleracion:.1f}')
+
+
+if __name__ == '__main__':
+    main()
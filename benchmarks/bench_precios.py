@@ -0,0 +1,100 @@
+"""Normalización de precios del maestro: normalizar_precios (vectorizada) contra limpiar_precio (celda a celda).
+
+Primero verifica que las dos den exactamente lo mismo sobre un corpus de formatos argentinos
+(separador de miles, coma decimal, $, blancos, números de Excel) y después mide ambas sobre
+una columna del tamaño de un maestro grande. La equivalencia también corre con pytest en
+tests/test_normalizar_precios.py.
+
+    python benchmarks/bench_precios.py --filas 200000
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+
+from auditor import limpiar_precio, normalizar_precios  # noqa: E402
+
+CASOS = [
+    '$ 1.234,56', '$1.234.567', '1.234', '1,234', '12,50', '12.50', '12.5', '1.234,5', '$ 999',
+    '  $ 12 345 ', '1,234,567', '1.234.567,89', '0', '0,00', '-1.500', '$', '', '   ', 'abc',
+    'Consultar', '1.2.3', '12,345.67', '.5', ',50', '1.', '1,', '$ 1.299.999,00 ', '\t1.500\n',
+    '٣٠٠', 'US$ 1.500', '1e5', '12.345.6', None, np.nan, pd.NA, 0, -5, 15000, 15000.0, 1234.5,
+    1234.56, 0.1 + 0.2, 1e20, True, False, -0.0, -1234.5, 1e-5, 0.005, 12.345, 2.5e13, 1e16, float('inf'),
+    np.float32(1.5), np.int64(7),
+]
+
+
+def generar(filas, semilla=0):
+    """Columna de maestro: mezcla de números de Excel y textos con los formatos de las tiendas"""
+    rnd = random.Random(semilla)
+    formatos = [
+        lambda v: v,
+        lambda v: float(v),
+        lambda v: f'$ {v:,}'.replace(',', '.'),
+        lambda v: f'{v:,.2f}'.replace(',', 'X').replace('.', ',').replace('X', '.'),
+        lambda v: f'{v / 100:.2f}',
+        lambda v: f'{v},00',
+        lambda v: '',
+        lambda v: None,
+    ]
+    return [rnd.choice(formatos)(rnd.randint(1, 3_000_000)) for _ in range(filas)]
+
+
+def comparar(serie):
+    esperado = serie.apply(limpiar_precio).astype(float)
+    obtenido = normalizar_precios(serie)
+    distintos = ~((esperado == obtenido) | (esperado.isna() & obtenido.isna()))
+    return esperado, obtenido, distintos
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--filas', type=int, default=200_000)
+    args = parser.parse_args()
+
+    columnas = {
+        'casos': pd.Series(CASOS, dtype=object),
+        'mixta': pd.Series(generar(args.filas), dtype=object),
+        # Maestro real: los mismos precios se repiten en muchos SKU
+        'texto': pd.Series(generar(5_000, semilla=1), dtype=object).sample(args.filas, replace=True, random_state=0)
+                   .map(lambda v: v if isinstance(v, str) or v is None else f'$ {v}').reset_index(drop=True)
+                   .astype(object),
+        # Enteros guardados como float (NaN en la columna), centavos y algún valor con más decimales
+        'float': pd.Series(np.random.default_rng(0).uniform(1, 3e6, args.filas)).round(2)
+                   .where(np.arange(args.filas) % 3 != 0, lambda s: s.round()).where(np.arange(args.filas) % 50 != 0),
+        'str': pd.Series(generar(5_000, semilla=2)).sample(args.filas, replace=True, random_state=0)
+                 .map(lambda v: None if v is None else str(v)).reset_index(drop=True).astype('string'),
+        'int': pd.Series(np.random.default_rng(1).integers(-10, 3_000_000, args.filas)),
+    }
+
+    fallas = 0
+    for nombre, serie in columnas.items():
+        esperado, obtenido, distintos = comparar(serie)
+        fallas += int(distintos.sum())
+        for i in distintos[distintos].index[:10]:
+            print(f'{nombre}[{i}] {serie[i]!r}: limpiar_precio={esperado[i]!r} normalizar_precios={obtenido[i]!r}')
+        print(f'{nombre:<6} {len(serie):>8} filas  equivalentes: {"sí" if not distintos.any() else "NO"}')
+
+    print()
+    for nombre in ('mixta', 'texto', 'str', 'float'):
+        serie = columnas[nombre]
+        inicio = time.perf_counter()
+        serie.apply(limpiar_precio)
+        t_celda = time.perf_counter() - inicio
+        inicio = time.perf_counter()
+        normalizar_precios(serie)
+        t_vector = time.perf_counter() - inicio
+        print(f'{nombre:<6} apply: {t_celda * 1000:8.1f} ms   vectorizada: {t_vector * 1000:8.1f} ms   x{t_celda / t_vector:.1f}')
+
+    sys.exit(1 if fallas else 0)
+
+
+if __name__ == '__main__':
+    main()
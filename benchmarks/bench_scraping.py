@@ -0,0 +1,347 @@
+"""Benchmark de scraping de punta a punta sin red: realizar_scraping contra un servidor local con las páginas guardadas.
+
+Un proceso aparte sirve benchmarks/fixtures/<tienda>.html en http://127.0.0.1:<puerto>/<tienda>/<n>, con
+latencia y errores inyectados (500 y 429 con Retry-After). Cada combinación tienda / motor / concurrencia
+corre en su propio proceso, así que la CPU y el pico de memoria medidos son solo los del scraping
+(más sus procesos hijos de parseo o navegador) y no arrastran lo de la corrida anterior. La CPU y el pico
+de memoria de los hijos se leen de /proc cada 50 ms (ver MuestreoHijos); sin /proc se usa RUSAGE_CHILDREN,
+que no ve a los hijos del forkserver.
+
+    python benchmarks/bench_scraping.py --urls 500 --latencia-ms 80 --concurrencia 4,16,64
+    python benchmarks/bench_scraping.py --tiendas ICBC,Fravega --motores async,hilos --errores 0.02 --json bench.json
+
+Motores:
+    async          aiohttp (MotorHTTPAsync), parseo en el mismo proceso
+    async+parseo   aiohttp + TuberiaParseo (fuerza al menos 2 procesos de parseo)
+    hilos          requests en ThreadPoolExecutor
+    hilos+parseo   hilos de descarga + TuberiaParseo
+    navegador      Frávega con Playwright (sin pasada HTTP); requiere Chromium instalado
+"""
+import argparse
+import http.server
+import json
+import logging
+import multiprocessing
+import os
+import random
+import resource
+import socketserver
+import statistics
+import sys
+import threading
+import time
+import zlib
+
+import pandas as pd
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+
+import auditor  # noqa: E402
+from auditor import TIENDAS_CONFIG, realizar_scraping  # noqa: E402
+
+FIXTURES = os.path.join(RAIZ, 'benchmarks', 'fixtures')
+
+MOTORES = {
+    'async': {'aiohttp': True, 'parseo': False},
+    'async+parseo': {'aiohttp': True, 'parseo': True},
+    'hilos': {'aiohttp': False, 'parseo': False},
+    'hilos+parseo': {'aiohttp': False, 'parseo': True},
+    'navegador': {'aiohttp': True, 'parseo': False, 'solo': 'Fravega'},
+}
+
+
+class ServidorTiendas(socketserver.ThreadingMixIn, http.server.HTTPServer):
+    daemon_threads = True
+    # Muchas conexiones en vuelo a la vez: que el backlog no sea el cuello de botella
+    request_queue_size = 1024
+
+    def handle_error(self, request, client_address):
+        # La lectura parcial corta la descarga y cierra la conexión: es lo esperado, no un error del servidor
+        if not isinstance(sys.exc_info()[1], (ConnectionResetError, BrokenPipeError)):
+            super().handle_error(request, client_address)
+
+
+def crear_manejador(paginas, latencia_ms, jitter_ms, errores, tasa_429, retry_after):
+    vistas_429 = set()
+    lock = threading.Lock()
+
+    class Manejador(http.server.BaseHTTPRequestHandler):
+        # keep-alive como un sitio real: el pool de conexiones del motor se reutiliza
+        protocol_version = 'HTTP/1.1'
+
+        def log_message(self, *args):
+            pass
+
+        def _responder(self, status, cuerpo=b'', headers=None):
+            self.send_response(status)
+            self.send_header('Content-Type', 'text/html; charset=utf-8')
+            self.send_header('Content-Length', str(len(cuerpo)))
+            for clave, valor in (headers or {}).items():
+                self.send_header(clave, valor)
+            self.end_headers()
+            self.wfile.write(cuerpo)
+
+        def do_GET(self):
+            ruta = self.path.split('?')[0].strip('/')
+            tienda = ruta.split('/')[0]
+            if tienda not in paginas:
+                self._responder(404, b'no encontrado')
+                return
+
+            if latencia_ms or jitter_ms:
+                time.sleep(max(0.0, latencia_ms + random.uniform(-jitter_ms, jitter_ms)) / 1000)
+
+            # Errores deterministas por URL: la misma corrida da los mismos errores en cada motor
+            sorteo = zlib.crc32(ruta.encode()) % 10000 / 10000
+            if sorteo < errores:
+                self._responder(500, b'error inyectado')
+                return
+            if sorteo < errores + tasa_429:
+                with lock:
+                    primera_vez = ruta not in vistas_429
+                    vistas_429.add(ruta)
+                if primera_vez:
+                    self._responder(429, b'demasiadas requests', {'Retry-After': str(retry_after)})
+                    return
+
+            self._responder(200, paginas[tienda])
+
+    return Manejador
+
+
+def servir(cola, latencia_ms, jitter_ms, errores, tasa_429, retry_after):
+    """Proceso servidor: una página guardada por tienda, en memoria"""
+    paginas = {}
+    for tienda in TIENDAS_CONFIG:
+        ruta = os.path.join(FIXTURES, f'{tienda.lower()}.html')
+        if os.path.exists(ruta):
+            with open(ruta, 'rb') as f:
+                paginas[tienda.lower()] = f.read()
+
+    manejador = crear_manejador(paginas, latencia_ms, jitter_ms, errores, tasa_429, retry_after)
+    servidor = ServidorTiendas(('127.0.0.1', 0), manejador)
+    cola.put(servidor.server_address[1])
+    servidor.serve_forever()
+
+
+def config_bench(tienda, motor, concurrencia):
+    """Config de la tienda con la concurrencia fija y el motor pedido"""
+    config = dict(TIENDAS_CONFIG[tienda])
+    config.update({
+        'concurrencia_inicial': concurrencia,
+        'max_conexiones_host': concurrencia,
+        'hilos_descarga': concurrencia,
+        'procesos_parseo': max(2, os.cpu_count() or 1) if MOTORES[motor]['parseo'] else 1,
+    })
+    if tienda == 'Fravega':
+        config['max_paginas_concurrentes'] = concurrencia
+        config['http_primero'] = motor != 'navegador'
+    return config
+
+
+def cpu_propio_s():
+    propio = resource.getrusage(resource.RUSAGE_SELF)
+    return propio.ru_utime + propio.ru_stime
+
+
+# Los procesos de parseo/navegador nacen de un forkserver: cuelgan de él y no de la corrida, así que
+# RUSAGE_CHILDREN no los ve. Con /proc se muestrean todos los descendientes de la corrida.
+MEDICION_PROC = os.path.isdir('/proc/self/task')
+TICKS_S = os.sysconf('SC_CLK_TCK') if MEDICION_PROC else 100
+
+
+def _stat(pid):
+    """(ppid, segundos de CPU) de /proc/<pid>/stat, o None si el proceso ya no está"""
+    try:
+        with open(f'/proc/{pid}/stat') as f:
+            campos = f.read().rsplit(')', 1)[1].split()
+    except OSError:
+        return None
+    return int(campos[1]), (int(campos[11]) + int(campos[12])) / TICKS_S
+
+
+def _pico_kb(pid):
+    try:
+        with open(f'/proc/{pid}/status') as f:
+            for linea in f:
+                if linea.startswith('VmHWM:'):
+                    return int(linea.split()[1])
+    except OSError:
+        pass
+    return 0
+
+
+class MuestreoHijos(threading.Thread):
+    """CPU y pico de memoria (VmHWM) de todos los descendientes de este proceso, leídos de /proc
+
+    Muestra cada `intervalo` segundos: de un proceso que termina entre dos muestras se pierde a lo sumo
+    la CPU de ese último intervalo. El pico de memoria no se pierde (VmHWM solo crece).
+    """
+
+    def __init__(self, intervalo=0.05):
+        super().__init__(daemon=True)
+        self.intervalo = intervalo
+        self.cpu = {}
+        self.pico_kb = {}
+        self._fin = threading.Event()
+
+    def muestrear(self):
+        stats = {}
+        for entrada in os.listdir('/proc'):
+            if entrada.isdigit():
+                stat = _stat(int(entrada))
+                if stat:
+                    stats[int(entrada)] = stat
+        hijos = {}
+        for pid, (ppid, _) in stats.items():
+            hijos.setdefault(ppid, []).append(pid)
+        pendientes = list(hijos.get(os.getpid(), []))
+        while pendientes:
+            pid = pendientes.pop()
+            self.cpu[pid] = stats[pid][1]
+            self.pico_kb[pid] = max(self.pico_kb.get(pid, 0), _pico_kb(pid))
+            pendientes.extend(hijos.get(pid, []))
+
+    def run(self):
+        while not self._fin.wait(self.intervalo):
+            self.muestrear()
+
+    def detener(self):
+        self._fin.set()
+        self.join()
+        self.muestrear()
+        return sum(self.cpu.values()), max(self.pico_kb.values(), default=0) / 1024
+
+
+def corrida(cola, puerto, tienda, motor, concurrencia, urls):
+    """Proceso medido: una llamada a realizar_scraping y sus números"""
+    logging.disable(logging.WARNING)
+    auditor.AIOHTTP_AVAILABLE = MOTORES[motor]['aiohttp'] and auditor.AIOHTTP_AVAILABLE
+
+    df = pd.DataFrame({'url': [f'http://127.0.0.1:{puerto}/{tienda.lower()}/producto-{i:06d}' for i in range(urls)]})
+    config = config_bench(tienda, motor, concurrencia)
+    memoria_base = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+    muestreo = MuestreoHijos() if MEDICION_PROC else None
+    if muestreo:
+        muestreo.start()
+    cpu_inicio = cpu_propio_s()
+    inicio = time.perf_counter()
+    resultados = realizar_scraping(df, config, tienda)
+    segundos = time.perf_counter() - inicio
+    cpu_propia = cpu_propio_s() - cpu_inicio
+
+    if muestreo:
+        cpu_hijos, pico_hijos = muestreo.detener()
+    else:
+        # Sin /proc: solo los hijos directos ya esperados (los del forkserver no entran)
+        for proceso in multiprocessing.active_children():
+            proceso.join(timeout=10)
+        hijos = resource.getrusage(resource.RUSAGE_CHILDREN)
+        cpu_hijos, pico_hijos = hijos.ru_utime + hijos.ru_stime, hijos.ru_maxrss / 1024
+
+    estados = pd.Series([r['estado_producto'] for r in resultados])
+    cola.put({
+        'tienda': tienda,
+        'motor': motor,
+        'concurrencia': concurrencia,
+        'urls': len(resultados),
+        'ok': int(((estados == 'Activo') & pd.Series([bool(r.get('precio_web')) for r in resultados])).sum()),
+        'errores': int((estados == 'Error').sum()),
+        'segundos': segundos,
+        'urls_por_s': len(resultados) / segundos,
+        'cpu_s': cpu_propia + cpu_hijos,
+        'cpu_hijos_s': cpu_hijos,
+        'memoria_base_mb': memoria_base,
+        'pico_mb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+        'pico_hijos_mb': pico_hijos,
+        'medicion_hijos': 'proc' if muestreo else 'rusage',
+    })
+
+
+def medir(contexto, puerto, tienda, motor, concurrencia, urls):
+    cola = contexto.Queue()
+    proceso = contexto.Process(target=corrida, args=(cola, puerto, tienda, motor, concurrencia, urls))
+    proceso.start()
+    try:
+        return cola.get(timeout=600)
+    finally:
+        proceso.join()
+
+
+def lista(valor):
+    return [v.strip() for v in valor.split(',') if v.strip()]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--tiendas', type=lista, default=list(TIENDAS_CONFIG),
+                        help="Tiendas separadas por coma (default: todas)")
+    parser.add_argument('--motores', type=lista, default=['async', 'hilos'],
+                        help=f"Motores separados por coma: {', '.join(MOTORES)} (default: async,hilos)")
+    parser.add_argument('--concurrencia', type=lambda v: [int(c) for c in lista(v)], default=[4, 16],
+                        help="Niveles de concurrencia separados por coma (default: 4,16)")
+    parser.add_argument('--urls', type=int, default=200, help="URLs por corrida (default: 200)")
+    parser.add_argument('--latencia-ms', type=float, default=50)
+    parser.add_argument('--jitter-ms', type=float, default=0)
+    parser.add_argument('--errores', type=float, default=0.0, help="Fracción de URLs que responden 500")
+    parser.add_argument('--tasa-429', type=float, default=0.0,
+                        help="Fracción de URLs que responden 429 la primera vez")
+    parser.add_argument('--retry-after', type=float, default=0, help="Segundos del Retry-After de los 429")
+    parser.add_argument('--repeticiones', type=int, default=1, help="Corridas por combinación (se informa la mediana)")
+    parser.add_argument('--json', help="Guardar también los resultados en este archivo")
+    args = parser.parse_args()
+
+    desconocidos = [m for m in args.motores if m not in MOTORES]
+    if desconocidos:
+        parser.error(f"Motores desconocidos: {', '.join(desconocidos)}")
+    sin_pagina = [t for t in args.tiendas if not os.path.exists(os.path.join(FIXTURES, f'{t.lower()}.html'))]
+    if sin_pagina:
+        parser.error(f"Sin página guardada en benchmarks/fixtures para: {', '.join(sin_pagina)}")
+
+    # fork: las corridas arrancan con auditor ya importado (y en Windows no hay resource de todos modos)
+    contexto = multiprocessing.get_context('fork')
+    cola = contexto.Queue()
+    servidor = contexto.Process(target=servir, daemon=True, args=(
+        cola, args.latencia_ms, args.jitter_ms, args.errores, args.tasa_429, args.retry_after))
+    servidor.start()
+    puerto = cola.get(timeout=30)
+
+    print(f"Servidor local :{puerto} | latencia {args.latencia_ms:.0f}±{args.jitter_ms:.0f} ms | "
+          f"500: {args.errores:.0%} | 429: {args.tasa_429:.0%} | {args.urls} URLs por corrida | {os.cpu_count()} CPU")
+    if not MEDICION_PROC:
+        print('Sin /proc: CPU y "Hijos MB" no incluyen los procesos de parseo/navegador del forkserver')
+    print(f"{'Tienda':<12} {'Motor':<13} {'Conc':>5} {'URLs/s':>8} {'Seg':>7} {'CPU s':>7} {'ms CPU/URL':>10} "
+          f"{'Pico MB':>8} {'Hijos MB':>8} {'OK':>5} {'Err':>5}")
+
+    filas = []
+    try:
+        for tienda in args.tiendas:
+            for motor in args.motores:
+                solo = MOTORES[motor].get('solo')
+                if solo and solo != tienda:
+                    continue
+                if motor == 'navegador' and not auditor.PLAYWRIGHT_AVAILABLE:
+                    print(f"{tienda:<12} {motor:<13} Playwright no instalado: se omite")
+                    continue
+                for concurrencia in args.concurrencia:
+                    corridas = [medir(contexto, puerto, tienda, motor, concurrencia, args.urls)
+                                for _ in range(args.repeticiones)]
+                    fila = min(corridas, key=lambda c: abs(c['urls_por_s'] - statistics.median(
+                        x['urls_por_s'] for x in corridas)))
+                    filas.append(fila)
+                    print(f"{tienda:<12} {motor:<13} {concurrencia:>5} {fila['urls_por_s']:>8.1f} "
+                          f"{fila['segundos']:>7.2f} {fila['cpu_s']:>7.2f} {fila['cpu_s'] / max(fila['urls'], 1) * 1000:>10.2f} "
+                          f"{fila['pico_mb']:>8.0f} {fila['pico_hijos_mb']:>8.0f} {fila['ok']:>5} {fila['errores']:>5}",
+                          flush=True)
+    finally:
+        servidor.terminate()
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump({'parametros': vars(args), 'resultados': filas}, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == '__main__':
+    main()
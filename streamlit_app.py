@@ -2,28 +2,18 @@ import streamlit as st
 import pandas as pd
 import numpy as np
 from datetime import datetime
-import plotly.express as px
-import plotly.graph_objects as go
-from io import BytesIO
 import time
-import requests
-from bs4 import BeautifulSoup
-import re
-from concurrent.futures import ThreadPoolExecutor, as_completed
+import hashlib
 
-try:
-    from playwright.sync_api import sync_playwright
-    PLAYWRIGHT_AVAILABLE = True
-except ImportError:
-    PLAYWRIGHT_AVAILABLE = False
-    st.warning("Playwright no instalado. Frávega tendrá funcionalidad limitada.")
-
-try:
-    from openpyxl import Workbook
-    from openpyxl.styles import Font, PatternFill, Border, Side
-    from openpyxl.utils import get_column_letter
-except ImportError:
-    st.error("Instala: pip install openpyxl")
+from auditor import (
+    TIENDAS_CONFIG, TODAS_LAS_TIENDAS, PLAYWRIGHT_AVAILABLE, OPENPYXL_AVAILABLE, PARQUET_AVAILABLE,
+    leer_encabezado_maestro, leer_maestro,
+    detectar_columnas_automaticamente, detectar_columnas_tiendas, preparar_df_tienda, preparar_dfs_tiendas,
+    realizar_scraping_tiendas, combinar_tiendas, descargas_ahorradas,
+    FASES_URL, tabla_rendimiento, throughput_rendimiento, resumen_rendimiento, exportar_rendimiento, vias_resolucion,
+    CacheHTTP, CheckpointAuditoria, HistorialAuditorias,
+    combinar_resultados, calcular_validaciones, exportar_resultados,
+)
 
 st.set_page_config(
     page_title="Auditor Automático",
@@ -60,535 +50,38 @@ st.markdown("""
 </div>
 """, unsafe_allow_html=True)
 
+if not PLAYWRIGHT_AVAILABLE:
+    st.warning("Playwright no instalado. Frávega tendrá funcionalidad limitada.")
+if not OPENPYXL_AVAILABLE:
+    st.error("Instala: pip install openpyxl")
+
 if 'audit_results' not in st.session_state:
     st.session_state.audit_results = None
+if 'audit_id' not in st.session_state:
+    st.session_state.audit_id = None
+if 'audit_rendimiento' not in st.session_state:
+    st.session_state.audit_rendimiento = None
 
-TIENDAS_CONFIG = {
-    "ICBC": {
-        "columnas_busqueda": ["ICBC", "icbc"],
-        "selector_titulo": "h1[itemprop='name']",
-        "selector_precio": "p.monto",
-        "selector_precio_tachado": "p.precio-anterior",
-        "selector_descuento": "p.descuento",
-        "selector_categoria": "span.breadcrumb-span[itemprop='title']"
-    },
-    "Supervielle": {
-        "columnas_busqueda": ["Supervielle", "supervielle"],
-        "selector_titulo": "h1[itemprop='name']",
-        "selector_precio": "span#our_price_display",
-        "selector_precio_tachado": "span.price",
-        "selector_descuento": "span#reduction_percent_display",
-        "selector_categoria": "span[itemprop='title']"
-    },
-    "Galicia": {
-        "columnas_busqueda": ["Galicia", "galicia"],
-        "selector_titulo": "h1.productTitle",
-        "selector_precio": "div.productPrice span",
-        "selector_descuento": "span.discount.discount-percentage",
-        "selector_categoria": "span[itemprop='name']"
-    },
-    "Ciudad": {
-        "columnas_busqueda": ["Ciudad", "ciudad"],
-        "selector_titulo": "h1.name",
-        "selector_precio": "span.amount",
-        "selector_precio_tachado": "div[itemprop='offers'] span.amount",
-        "selector_categoria": "a[href*='/catalog/']"
-    },
-    "Fravega": {
-        "columnas_busqueda": ["Fravega", "fravega", "FVG", "fvg"],
-        "columnas_cuotas": ["Cuotas FVG", "CSI FVG", "Financiacion Fvg", "Financiación FVG", "cuotas fvg", "csi fvg"],
-        "selector_titulo": "h1[data-test-id='product-title']",
-        "selector_precio": "span.sc-1d9b1d9e-0.sc-faa1a185-3",
-        "selector_precio_tachado": "span.sc-e081bce1-0.sc-faa1a185-4",
-        "selector_descuento": "span.sc-e2aca368-0",
-        "selector_categoria": "span[itemprop='name']",
-        "selector_cuotas_container": "span.sc-3cba7521-10",
-        "urls_visa_master": ["54c0d769ece1b", "d91d7904a8578", "visa", "mastercard"]
-    },
-    "BNA": {
-        "columnas_busqueda": ["BNA", "bna"],
-        "selector_precio": "span.price"
-    },
-    "Megatone": {
-        "columnas_busqueda": ["Megatone", "megatone", "MGT", "mgt"],
-        "columnas_cuotas": ["Cuotas MGT", "CSI MGT", "cuotas mgt", "csi mgt"],
-        "selector_precio": "span.price"
-    }
-}
+@st.cache_data(max_entries=12, show_spinner=False)
+def exportacion_cacheada(audit_id, tienda, formato, filtro, _df_results):
+    """Una exportación por auditoría/formato/filtro: los reruns de Streamlit no la regeneran"""
+    return exportar_resultados(_df_results, tienda, formato)
 
-def detectar_columnas_automaticamente(df, tienda):
-    config = TIENDAS_CONFIG[tienda]
-    resultado = {'url': None, 'precio': None, 'sku': None, 'cuotas': None}
-    
-    # Patrones más amplios para detección
-    patrones_url = []
-    patrones_precio = []
-    patrones_cuotas = []
-    
-    for busqueda in config['columnas_busqueda']:
-        patrones_url.extend([f'{busqueda} url', f'url {busqueda}', f'{busqueda} link', f'link {busqueda}'])
-        patrones_precio.extend([f'pvp {busqueda}', f'{busqueda} pvp', f'precio {busqueda}', f'{busqueda} precio'])
-    
-    if 'columnas_cuotas' in config:
-        for busqueda in config['columnas_cuotas']:
-            patrones_cuotas.append(busqueda.lower())
-    
-    for col in df.columns:
-        col_lower = col.lower().strip()
-        
-        if resultado['url'] is None:
-            for patron in patrones_url:
-                if patron.lower() in col_lower:
-                    resultado['url'] = col
-                    break
-        
-        if resultado['precio'] is None:
-            for patron in patrones_precio:
-                if patron.lower() in col_lower:
-                    resultado['precio'] = col
-                    break
-        
-        if resultado['sku'] is None:
-            if any(word in col_lower for word in ['sku', 'codigo', 'código']):
-                resultado['sku'] = col
-        
-        if 'columnas_cuotas' in config and resultado['cuotas'] is None:
-            for patron in patrones_cuotas:
-                if patron in col_lower:
-                    resultado['cuotas'] = col
-                    break
-    
-    return resultado
+def huella_archivo(uploaded_file):
+    """SHA-1 del contenido subido, calculado una sola vez por archivo (no en cada rerun)"""
+    huellas = st.session_state.setdefault('huellas_maestro', {})
+    if uploaded_file.file_id not in huellas:
+        huellas[uploaded_file.file_id] = hashlib.sha1(uploaded_file.getvalue()).hexdigest()
+    return huellas[uploaded_file.file_id]
 
-def limpiar_precio(valor):
-    if pd.isna(valor):
-        return None
-    
-    precio_str = str(valor).replace('$', '').replace(' ', '').strip()
-    
-    if not precio_str:
-        return None
-    
-    if '.' in precio_str and ',' in precio_str:
-        precio_str = precio_str.replace('.', '').replace(',', '.')
-    elif '.' in precio_str:
-        if re.search(r'\.\d{3}', precio_str):
-            precio_str = precio_str.replace('.', '')
-        elif not re.search(r'\.\d{2}$', precio_str):
-            precio_str = precio_str.replace('.', '')
-    elif ',' in precio_str:
-        if re.search(r',\d{2}$', precio_str):
-            precio_str = precio_str.replace(',', '.')
-        else:
-            precio_str = precio_str.replace(',', '')
-    
-    try:
-        valor_float = float(re.sub(r'[^\d.]', '', precio_str))
-        return valor_float if valor_float > 0 else None
-    except:
-        return None
+# El maestro se lee una vez por contenido: cambiar un widget no lo vuelve a parsear
+@st.cache_data(max_entries=4, show_spinner=False)
+def encabezado_cacheado(huella, nombre, _contenido):
+    return leer_encabezado_maestro(_contenido, nombre)
 
-class WebScraper:
-    def __init__(self, tienda_config, tienda_nombre):
-        self.config = tienda_config
-        self.tienda = tienda_nombre
-        self.session = requests.Session()
-        self.session.headers.update({
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
-            'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8',
-            'Accept-Language': 'es-AR,es;q=0.9,en;q=0.8',
-            'Referer': 'https://www.google.com/'
-        })
-    
-    def scrape_fravega_con_playwright(self, url):
-        """Scrapea Frávega usando Playwright para contenido dinámico"""
-        
-        # VALIDACIÓN: URL debe ser válida
-        if not url or not isinstance(url, str):
-            return {
-                'url': url,
-                'titulo': None,
-                'precio_web': None,
-                'precio_tachado': None,
-                'descuento_%': None,
-                'categoria': None,
-                'cuotas': None,
-                'estado_producto': 'Error',
-                'estado_scraping': '❌ URL inválida',
-                'timestamp': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-            }
-        
-        # VALIDACIÓN: URL debe comenzar con http:// o https://
-        if not url.startswith('http://') and not url.startswith('https://'):
-            return {
-                'url': url,
-                'titulo': None,
-                'precio_web': None,
-                'precio_tachado': None,
-                'descuento_%': None,
-                'categoria': None,
-                'cuotas': None,
-                'estado_producto': 'Error',
-                'estado_scraping': '❌ URL incompleta - falta https://',
-                'timestamp': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-            }
-        
-        # VALIDACIÓN: URL muy corta
-        if len(url) < 30:
-            return {
-                'url': url,
-                'titulo': None,
-                'precio_web': None,
-                'precio_tachado': None,
-                'descuento_%': None,
-                'categoria': None,
-                'cuotas': None,
-                'estado_producto': 'Error',
-                'estado_scraping': '❌ URL demasiado corta',
-                'timestamp': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-            }
-        
-        resultado = {
-            'url': url,
-            'titulo': None,
-            'precio_web': None,
-            'precio_tachado': None,
-            'descuento_%': None,
-            'categoria': None,
-            'cuotas': None,
-            'estado_producto': 'Activo',
-            'estado_scraping': '✅ OK',
-            'timestamp': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-        }
-        
-        try:
-            with sync_playwright() as p:
-                browser = p.chromium.launch(headless=True)
-                context = browser.new_context(
-                    viewport={'width': 1920, 'height': 1080},
-                    user_agent='Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
-                )
-                page = context.new_page()
-                
-                page.goto(url, wait_until='networkidle', timeout=30000)
-                page.wait_for_timeout(3000)
-                
-                # PRIMERO: Verificar si está inhabilitado
-                producto_inhabilitado = False
-                try:
-                    boton = page.locator("button[data-test-id='product-buy-button']").first
-                    boton.wait_for(timeout=5000)
-                    
-                    is_disabled = boton.is_disabled()
-                    has_disabled_attr = boton.get_attribute('disabled') is not None
-                    
-                    if is_disabled or has_disabled_attr:
-                        producto_inhabilitado = True
-                    
-                    texto_boton = boton.text_content()
-                    if texto_boton and 'no disponible' in texto_boton.lower():
-                        producto_inhabilitado = True
-                        
-                except:
-                    producto_inhabilitado = True
-                
-                # Título (siempre intentar obtener)
-                try:
-                    titulo = page.locator("h1[data-test-id='product-title']").text_content(timeout=5000)
-                    if titulo:
-                        resultado['titulo'] = titulo.strip()
-                except:
-                    pass
-                
-                # CORRECCIÓN: Categorías - excluir "Frávega" y tomar última válida
-                try:
-                    categorias_elems = page.locator("span[itemprop='name']").all()
-                    categorias_validas = []
-                    for elem in categorias_elems:
-                        texto = elem.text_content().strip()
-                        # Excluir explícitamente nombres de tiendas
-                        if texto and texto.lower() not in ['frávega', 'fravega', 'inicio', 'home']:
-                            categorias_validas.append(texto)
-                    
-                    # Tomar la ÚLTIMA categoría válida
-                    if categorias_validas:
-                        resultado['categoria'] = categorias_validas[-1]
-                except:
-                    pass
-                
-                # Si está inhabilitado, marcar correctamente y NO scrapear precios
-                if producto_inhabilitado:
-                    resultado['estado_producto'] = 'Inhabilitado'
-                    resultado['estado_scraping'] = '⚠️ Botón de compra deshabilitado'
-                    resultado['cuotas'] = None
-                    browser.close()
-                    return resultado
-                
-                # Precio (solo si está habilitado)
-                try:
-                    precio = page.locator("span.sc-1d9b1d9e-0.sc-faa1a185-3").first.text_content(timeout=5000)
-                    resultado['precio_web'] = limpiar_precio(precio)
-                except:
-                    pass
-                
-                # Precio tachado
-                try:
-                    tachado = page.locator("span.sc-e081bce1-0.sc-faa1a185-4").first.text_content(timeout=5000)
-                    resultado['precio_tachado'] = limpiar_precio(tachado)
-                except:
-                    pass
-                
-                # Descuento
-                try:
-                    descuento = page.locator("span.sc-e2aca368-0").first.text_content(timeout=5000)
-                    match = re.search(r'(\d+)', descuento)
-                    if match:
-                        resultado['descuento_%'] = float(match.group(1))
-                except:
-                    pass
-                
-                # CORRECCIÓN CRÍTICA: Cuotas - SOLO primeras 2 imágenes (Visa y Mastercard)
-                cuotas_encontradas = False
-                try:
-                    page_content = page.content()
-                    soup = BeautifulSoup(page_content, 'html.parser')
-                    
-                    cuotas_divs = soup.find_all('div', class_=lambda x: x and 'sc-3cba7521-0' in x)
-                    
-                    for div in cuotas_divs:
-                        cuotas_span = div.find('span', class_=lambda x: x and 'sc-3cba7521-10' in x)
-                        
-                        if not cuotas_span:
-                            continue
-                        
-                        texto = cuotas_span.get_text()
-                        match = re.search(r'(\d+)\s*cuotas?', texto, re.IGNORECASE)
-                        
-                        if not match:
-                            continue
-                        
-                        num_cuotas = int(match.group(1))
-                        
-                        img_container = div.find('div', class_=lambda x: x and 'sc-3cba7521-3' in x)
-                        
-                        if img_container:
-                            imagenes = img_container.find_all('img', src=True)
-                            
-                            # CRÍTICO: Solo verificar las primeras 2 imágenes
-                            if len(imagenes) >= 2:
-                                img1_src = imagenes[0].get('src', '').lower()
-                                img2_src = imagenes[1].get('src', '').lower()
-                                
-                                # Verificar que las primeras 2 sean Visa o Mastercard
-                                es_visa_master = ('d91d7904a8578' in img1_src or '54c0d769ece1b' in img1_src or
-                                                'd91d7904a8578' in img2_src or '54c0d769ece1b' in img2_src)
-                                
-                                if es_visa_master:
-                                    resultado['cuotas'] = num_cuotas
-                                    cuotas_encontradas = True
-                                    break
-                    
-                    if not cuotas_encontradas:
-                        resultado['cuotas'] = 1
-                        
-                except Exception as e:
-                    resultado['cuotas'] = 1
-                    resultado['estado_scraping'] = f'⚠️ OK (error cuotas: {str(e)[:20]})'
-                
-                # Validar que se haya scrapeado el precio
-                if not resultado['precio_web']:
-                    resultado['estado_scraping'] = '⚠️ No se obtuvo el precio'
-                
-                browser.close()
-                
-        except Exception as e:
-            resultado['estado_producto'] = 'Error'
-            resultado['estado_scraping'] = f'❌ {str(e)[:40]}'
-        
-        return resultado
-    
-    def scrape_url(self, url):
-        # CAMBIO CRÍTICO: Si es Frávega, usar Playwright directamente
-        if self.tienda == "Fravega":
-            if PLAYWRIGHT_AVAILABLE:
-                return self.scrape_fravega_con_playwright(url)
-            else:
-                return {
-                    'url': url,
-                    'titulo': None,
-                    'precio_web': None,
-                    'precio_tachado': None,
-                    'descuento_%': None,
-                    'categoria': None,
-                    'cuotas': None,
-                    'estado_producto': 'Error',
-                    'estado_scraping': '❌ Playwright no disponible',
-                    'timestamp': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-                }
-        
-        # Para otras tiendas, usar requests
-        resultado = {
-            'url': url,
-            'titulo': None,
-            'precio_web': None,
-            'precio_tachado': None,
-            'descuento_%': None,
-            'categoria': None,
-            'cuotas': None,
-            'estado_producto': 'Activo',
-            'estado_scraping': '✅ OK',
-            'timestamp': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-        }
-        
-        try:
-            response = self.session.get(url, timeout=15)
-            
-            if response.status_code == 404:
-                resultado['estado_producto'] = 'No disponible'
-                resultado['estado_scraping'] = '⚠️ Error 404'
-                return resultado
-            
-            response.raise_for_status()
-            soup = BeautifulSoup(response.content, 'html.parser')
-            
-            html_text = soup.get_text().lower()
-            if 'no longer available' in html_text or 'no está disponible' in html_text:
-                resultado['estado_producto'] = 'No disponible'
-                resultado['estado_scraping'] = '⚠️ Producto no disponible'
-                return resultado
-            
-            if 'selector_precio' in self.config:
-                precio_elem = soup.select_one(self.config['selector_precio'])
-                if precio_elem:
-                    resultado['precio_web'] = limpiar_precio(precio_elem.get_text(strip=True))
-            
-            if 'selector_precio_tachado' in self.config:
-                tachado_elem = soup.select_one(self.config['selector_precio_tachado'])
-                if tachado_elem:
-                    resultado['precio_tachado'] = limpiar_precio(tachado_elem.get_text(strip=True))
-            
-            if 'selector_descuento' in self.config:
-                desc_elem = soup.select_one(self.config['selector_descuento'])
-                if desc_elem:
-                    desc_text = desc_elem.get_text(strip=True)
-                    match = re.search(r'(\d+)', desc_text)
-                    if match:
-                        resultado['descuento_%'] = float(match.group(1))
-            
-            if self.tienda == "Galicia" and not resultado['precio_tachado'] and resultado['descuento_%'] and resultado['precio_web']:
-                descuento_decimal = resultado['descuento_%'] / 100
-                resultado['precio_tachado'] = resultado['precio_web'] / (1 - descuento_decimal)
-            
-            if not resultado['precio_web']:
-                resultado['estado_scraping'] = '⚠️ No se obtuvo el precio'
-            
-        except requests.exceptions.HTTPError as e:
-            if '404' in str(e):
-                resultado['estado_producto'] = 'No disponible'
-                resultado['estado_scraping'] = '⚠️ Error 404'
-            else:
-                resultado['estado_producto'] = 'Error'
-                resultado['estado_scraping'] = f'❌ {str(e)[:30]}'
-        except Exception as e:
-            resultado['estado_producto'] = 'Error'
-            resultado['estado_scraping'] = f'❌ {str(e)[:30]}'
-        
-        return resultado
-
-def realizar_scraping(df_tienda, tienda_config, tienda_nombre, progress_bar, status_text):
-    scraper = WebScraper(tienda_config, tienda_nombre)
-    resultados = []
-    
-    # Para Frávega, hacer scraping secuencial (Playwright no es thread-safe)
-    if tienda_nombre == "Fravega":
-        for idx, row in df_tienda.iterrows():
-            if pd.notna(row.get('url')):
-                resultado = scraper.scrape_url(row['url'])
-                resultado['idx'] = idx
-                resultados.append(resultado)
-                
-                completed = idx + 1
-                total = len(df_tienda)
-                progress_bar.progress(min(completed / total, 1.0))
-                status_text.text(f"Escaneando {completed}/{total}...")
-    else:
-        # Para otras tiendas, usar ThreadPool
-        with ThreadPoolExecutor(max_workers=5) as executor:
-            futures = {executor.submit(scraper.scrape_url, row['url']): idx 
-                      for idx, row in df_tienda.iterrows() if pd.notna(row.get('url'))}
-            
-            completed = 0
-            total = len(futures)
-            
-            for future in as_completed(futures):
-                completed += 1
-                idx = futures[future]
-                resultado = future.result()
-                resultado['idx'] = idx
-                resultados.append(resultado)
-                
-                progress_bar.progress(min(completed / total, 1.0))
-                status_text.text(f"Escaneando {completed}/{total}...")
-    
-    return resultados
-
-def crear_excel_formateado(df_results, tienda):
-    output = BytesIO()
-    wb = Workbook()
-    ws = wb.active
-    ws.title = "Resultados"
-    
-    ws['A1'] = f'AUDITORÍA {tienda.upper()} - {datetime.now().strftime("%d/%m/%Y %H:%M")}'
-    ws['A1'].font = Font(bold=True, size=14)
-    
-    if tienda in ["Fravega", "Megatone"]:
-        columnas = ['SKU', 'Título', 'Precio Maestro', 'Precio Web', 'Precio Tachado',
-                   'Descuento %', 'Variación %', 'Precio OK', 'Cuotas Maestro', 'Cuotas Web',
-                   'Cuotas OK', 'Categoría', 'Estado', 'Scraping', 'URL']
-        ws.merge_cells('A1:O1')
-    else:
-        columnas = ['SKU', 'Título', 'Precio Maestro', 'Precio Web', 'Precio Tachado',
-                   'Descuento %', 'Variación %', 'Precio OK', 'Categoría', 'Estado', 
-                   'Scraping', 'URL']
-        ws.merge_cells('A1:L1')
-    
-    ws.append([])
-    ws.append(columnas)
-    
-    for cell in ws[3]:
-        cell.font = Font(bold=True, color="FFFFFF")
-        cell.fill = PatternFill(start_color="667EEA", end_color="667EEA", fill_type="solid")
-    
-    for _, row in df_results.iterrows():
-        if tienda in ["Fravega", "Megatone"]:
-            row_data = [
-                row.get('sku'), row.get('titulo'), row.get('precio_maestro'),
-                row.get('precio_web'), row.get('precio_tachado'), row.get('descuento_%'),
-                row.get('variacion_precio_%'),
-                'Sí' if row.get('precio_ok') == True else 'No' if row.get('precio_ok') == False else '-',
-                row.get('cuotas_maestro'), row.get('cuotas'),
-                'Sí' if row.get('cuotas_correctas') == True else 'No' if row.get('cuotas_correctas') == False else '-',
-                row.get('categoria'), row.get('estado_producto'), 
-                row.get('estado_scraping'), row.get('url')
-            ]
-        else:
-            row_data = [
-                row.get('sku'), row.get('titulo'), row.get('precio_maestro'),
-                row.get('precio_web'), row.get('precio_tachado'), row.get('descuento_%'),
-                row.get('variacion_precio_%'),
-                'Sí' if row.get('precio_ok') == True else 'No' if row.get('precio_ok') == False else '-',
-                row.get('categoria'), row.get('estado_producto'),
-                row.get('estado_scraping'), row.get('url')
-            ]
-        ws.append(row_data)
-    
-    # Ajustar ancho de columnas
-    for idx in range(1, len(columnas) + 1):
-        ws.column_dimensions[get_column_letter(idx)].width = 15
-    
-    wb.save(output)
-    output.seek(0)
-    return output
+@st.cache_data(max_entries=2, show_spinner="Leyendo maestro...")
+def maestro_cacheado(huella, nombre, _contenido):
+    return leer_maestro(_contenido, nombre)
 
 with st.sidebar:
     st.markdown("""
@@ -599,7 +92,10 @@ with st.sidebar:
         </div>
     """, unsafe_allow_html=True)
     
-    selected_store = st.selectbox("🏪 Tienda", list(TIENDAS_CONFIG.keys()))
+    selected_store = st.selectbox("🏪 Tienda", list(TIENDAS_CONFIG.keys()) + [TODAS_LAS_TIENDAS],
+                                  format_func=lambda t: "🌐 Todas las tiendas" if t == TODAS_LAS_TIENDAS else t)
+    todas_las_tiendas = selected_store == TODAS_LAS_TIENDAS
+    con_cuotas = selected_store in ["Fravega", "Megatone", TODAS_LAS_TIENDAS]
     
     if selected_store == "Fravega":
         if not PLAYWRIGHT_AVAILABLE:
@@ -624,164 +120,217 @@ with st.sidebar:
         max_productos = 10
     else:
         modo_operacion = "Auditoría Completa"
-        max_productos = st.number_input("Límite:", 10, 1000, 100, 10)
+        max_productos = st.number_input("Límite por tienda:" if todas_las_tiendas else "Límite:", 10, 1000, 100, 10)
+    
+    with st.expander("💾 Checkpoints"):
+        reanudar = st.checkbox("Reanudar auditoría interrumpida", value=True,
+                               help="Si la última auditoría de esta tienda con el mismo maestro quedó a medias, "
+                                    "retoma desde ahí sin volver a escanear las URLs ya resueltas")
+        reanudar_horas = st.slider("Reanudar si empezó hace menos de (horas)", 1, 72, 8, 1, disabled=not reanudar,
+                                   help="Una auditoría más vieja se descarta: sus precios ya no son actuales")
+    
+    with st.expander("🔁 Auditoría delta"):
+        modo_delta = st.checkbox("Solo re-escanear lo que cambió", value=False,
+                                 help="Reutiliza el último resultado de cada SKU si su precio y cuotas del maestro "
+                                      "no cambiaron, no falló y no es más viejo que la antigüedad máxima")
+        edad_max_horas = st.slider("Antigüedad máxima (horas)", 1, 168, 24, 1, disabled=not modo_delta)
+    
+    with st.expander("🗄️ Cache HTTP"):
+        usar_cache = st.checkbox("Usar cache de páginas", value=True)
+        cache_ttl_horas = st.slider("Vigencia (horas)", 1, 24, 8, 1, disabled=not usar_cache)
+        forzar_actualizacion = st.checkbox("♻️ Forzar actualización", value=False, disabled=not usar_cache,
+                                           help="Descarga todo de nuevo aunque haya copias vigentes")
 
 tab1, tab2, tab3 = st.tabs(["📁 Cargar", "📊 Resultados", "📈 Dashboard"])
 
 with tab1:
     st.markdown("### 📝 Auditoría")
     
-    uploaded_file = st.file_uploader("Cargar Excel", type=['xlsx', 'xls'])
+    uploaded_file = st.file_uploader("Cargar maestro (Excel, CSV o Parquet)",
+                                     type=['xlsx', 'xls', 'csv'] + (['parquet'] if PARQUET_AVAILABLE else []))
     
     if uploaded_file:
-        df_maestro = pd.read_excel(uploaded_file)
-        
-        col1, col2, col3 = st.columns(3)
-        col1.metric("📄 Archivo", uploaded_file.name[:15] + "...")
-        col2.metric("📊 Filas", f"{len(df_maestro):,}")
-        col3.metric("📋 Columnas", len(df_maestro.columns))
-        
-        columnas_detectadas = detectar_columnas_automaticamente(df_maestro, selected_store)
-        
-        todas_detectadas = all([columnas_detectadas['url'], columnas_detectadas['sku'], columnas_detectadas['precio']])
-        if selected_store in ["Fravega", "Megatone"]:
-            todas_detectadas = todas_detectadas and columnas_detectadas['cuotas']
-        
-        if todas_detectadas:
-            st.success("✅ Todas las columnas detectadas automáticamente")
-            col1, col2 = st.columns(2)
-            col1.info(f"📍 URL: **{columnas_detectadas['url']}**")
-            col1.info(f"🏷️ SKU: **{columnas_detectadas['sku']}**")
-            col2.info(f"💰 Precio: **{columnas_detectadas['precio']}**")
-            if selected_store in ["Fravega", "Megatone"]:
-                col2.info(f"💳 Cuotas: **{columnas_detectadas['cuotas']}**")
+        huella = huella_archivo(uploaded_file)
+        # La detección de columnas solo necesita el encabezado
+        encabezado = encabezado_cacheado(huella, uploaded_file.name, uploaded_file.getvalue())
+        df_encabezado = pd.DataFrame(columns=encabezado)
+        
+        # Fila de métricas con sus propias columnas: las de la detección más abajo no las pisan
+        col_archivo, col_filas, col_columnas = st.columns(3)
+        col_archivo.metric("📄 Archivo", uploaded_file.name[:15] + "...")
+        col_columnas.metric("📋 Columnas", len(encabezado))
+        
+        if todas_las_tiendas:
+            # Un solo maestro para todas: cada tienda con sus columnas detectadas
+            columnas_tiendas = detectar_columnas_tiendas(df_encabezado)
+            sin_columnas = [t for t in TIENDAS_CONFIG if t not in columnas_tiendas]
             
-            url_column = columnas_detectadas['url']
-            sku_column = columnas_detectadas['sku']
-            precio_column = columnas_detectadas['precio']
-            cuotas_column = columnas_detectadas['cuotas'] if selected_store in ["Fravega", "Megatone"] else None
+            if columnas_tiendas:
+                st.success(f"✅ {len(columnas_tiendas)} tiendas detectadas en el maestro")
+                st.dataframe(pd.DataFrame([
+                    {'Tienda': t, 'URL': cols['url'], 'SKU': cols['sku'], 'Precio': cols['precio'],
+                     'Cuotas': cols['cuotas'] or '-'}
+                    for t, cols in columnas_tiendas.items()
+                ]), use_container_width=True, hide_index=True)
+            else:
+                st.error("❌ Ninguna tienda tiene columnas de URL, SKU y precio en el maestro")
+            if sin_columnas:
+                st.caption(f"Sin columnas en el maestro (no se auditan): {', '.join(sin_columnas)}")
         else:
-            st.warning("⚠️ Seleccione columnas manualmente:")
+            columnas_detectadas = detectar_columnas_automaticamente(df_encabezado, selected_store)
             
-            col1, col2 = st.columns(2)
-            
-            with col1:
-                url_column = st.selectbox("URL:", df_maestro.columns, 
-                                         index=list(df_maestro.columns).index(columnas_detectadas['url']) if columnas_detectadas['url'] else 0)
-                sku_column = st.selectbox("SKU:", df_maestro.columns,
-                                         index=list(df_maestro.columns).index(columnas_detectadas['sku']) if columnas_detectadas['sku'] else 0)
+            todas_detectadas = all([columnas_detectadas['url'], columnas_detectadas['sku'], columnas_detectadas['precio']])
+            if selected_store in ["Fravega", "Megatone"]:
+                todas_detectadas = todas_detectadas and columnas_detectadas['cuotas']
             
-            with col2:
-                precio_column = st.selectbox("Precio:", df_maestro.columns,
-                                            index=list(df_maestro.columns).index(columnas_detectadas['precio']) if columnas_detectadas['precio'] else 0)
-                
+            if todas_detectadas:
+                st.success("✅ Todas las columnas detectadas automáticamente")
+                col1, col2 = st.columns(2)
+                col1.info(f"📍 URL: **{columnas_detectadas['url']}**")
+                col1.info(f"🏷️ SKU: **{columnas_detectadas['sku']}**")
+                col2.info(f"💰 Precio: **{columnas_detectadas['precio']}**")
                 if selected_store in ["Fravega", "Megatone"]:
-                    cuotas_column = st.selectbox("Cuotas:", df_maestro.columns,
-                                                index=list(df_maestro.columns).index(columnas_detectadas['cuotas']) if columnas_detectadas['cuotas'] else 0)
-                else:
-                    cuotas_column = None
-        
-        df_tienda = df_maestro[df_maestro[url_column].notna()].copy()
-        
-        rename_dict = {url_column: 'url', sku_column: 'sku', precio_column: 'precio_maestro'}
-        if cuotas_column:
-            rename_dict[cuotas_column] = 'cuotas_maestro'
-        
-        df_tienda = df_tienda.rename(columns=rename_dict)
-        df_tienda['precio_maestro'] = df_tienda['precio_maestro'].apply(limpiar_precio)
-        
-        if 'cuotas_maestro' in df_tienda.columns:
-            df_tienda['cuotas_maestro'] = pd.to_numeric(df_tienda['cuotas_maestro'], errors='coerce')
-        
-        df_tienda = df_tienda.head(max_productos)
+                    col2.info(f"💳 Cuotas: **{columnas_detectadas['cuotas']}**")
+                
+                url_column = columnas_detectadas['url']
+                sku_column = columnas_detectadas['sku']
+                precio_column = columnas_detectadas['precio']
+                cuotas_column = columnas_detectadas['cuotas'] if selected_store in ["Fravega", "Megatone"] else None
+            else:
+                st.warning("⚠️ Seleccione columnas manualmente:")
+                
+                col1, col2 = st.columns(2)
+                
+                with col1:
+                    url_column = st.selectbox("URL:", encabezado, 
+                                             index=encabezado.index(columnas_detectadas['url']) if columnas_detectadas['url'] else 0)
+                    sku_column = st.selectbox("SKU:", encabezado,
+                                             index=encabezado.index(columnas_detectadas['sku']) if columnas_detectadas['sku'] else 0)
+                
+                with col2:
+                    precio_column = st.selectbox("Precio:", encabezado,
+                                                index=encabezado.index(columnas_detectadas['precio']) if columnas_detectadas['precio'] else 0)
+                    
+                    if selected_store in ["Fravega", "Megatone"]:
+                        cuotas_column = st.selectbox("Cuotas:", encabezado,
+                                                    index=encabezado.index(columnas_detectadas['cuotas']) if columnas_detectadas['cuotas'] else 0)
+                    else:
+                        cuotas_column = None
+        
+        # Las filas recién hacen falta para armar las tiendas: se leen (una vez por archivo) después de detectar
+        df_maestro = maestro_cacheado(huella, uploaded_file.name, uploaded_file.getvalue())
+        col_filas.metric("📊 Filas", f"{len(df_maestro):,}")
+        
+        if todas_las_tiendas:
+            dfs = preparar_dfs_tiendas(df_maestro, columnas_tiendas, max_productos)
+        else:
+            dfs = {selected_store: preparar_df_tienda(df_maestro, url_column, sku_column, precio_column,
+                                                      cuotas_column, max_productos)}
         
         st.markdown("---")
         
-        if st.button("🚀 INICIAR", type="primary", use_container_width=True):
+        if st.button("🚀 INICIAR", type="primary", use_container_width=True, disabled=not dfs):
             
             if "Prueba" in modo_operacion:
                 progress_bar = st.progress(0)
                 status_text = st.empty()
                 
-                resultados = []
-                for i, (idx, row) in enumerate(df_tienda.iterrows()):
-                    variacion = np.random.uniform(-10, 10)
-                    precio_maestro_val = row.get('precio_maestro', 10000)
-                    if pd.isna(precio_maestro_val):
-                        precio_maestro_val = 10000
-                    
-                    precio_web = float(precio_maestro_val * (1 + variacion/100))
-                    
-                    resultados.append({
-                        'idx': idx,
-                        'url': row['url'],
-                        'titulo': f"Producto Ejemplo {i+1}",
-                        'precio_web': precio_web,
-                        'precio_tachado': precio_web * 1.3,
-                        'descuento_%': float(np.random.randint(10, 40)),
-                        'categoria': "Categoría Ejemplo",
-                        'cuotas': int(np.random.choice([1, 3, 6, 9, 12])) if selected_store in ["Fravega", "Megatone"] else None,
-                        'estado_producto': 'Activo',
-                        'estado_scraping': '✅ OK'
-                    })
-                    
-                    progress_bar.progress((i + 1) / len(df_tienda))
-                    status_text.text(f"{i + 1}/{len(df_tienda)}")
-                    time.sleep(0.05)
+                total = sum(len(df) for df in dfs.values())
+                resultados = {}
+                i = 0
+                for tienda, df_tienda in dfs.items():
+                    resultados[tienda] = []
+                    for idx, row in df_tienda.iterrows():
+                        variacion = np.random.uniform(-10, 10)
+                        precio_maestro_val = row.get('precio_maestro', 10000)
+                        if pd.isna(precio_maestro_val):
+                            precio_maestro_val = 10000
+                        
+                        precio_web = float(precio_maestro_val * (1 + variacion/100))
+                        
+                        resultados[tienda].append({
+                            'idx': idx,
+                            'url': row['url'],
+                            'titulo': f"Producto Ejemplo {i+1}",
+                            'precio_web': precio_web,
+                            'precio_tachado': precio_web * 1.3,
+                            'descuento_%': float(np.random.randint(10, 40)),
+                            'categoria': "Categoría Ejemplo",
+                            'cuotas': int(np.random.choice([1, 3, 6, 9, 12])) if tienda in ["Fravega", "Megatone"] else None,
+                            'estado_producto': 'Activo',
+                            'estado_scraping': '✅ OK'
+                        })
+                        
+                        i += 1
+                        progress_bar.progress(i / total)
+                        status_text.text(f"{i}/{total}")
+                        time.sleep(0.05)
                 
                 progress_bar.empty()
                 status_text.empty()
+                reusados = {t: [] for t in dfs}
+                ahorradas = 0
+                df_rendimiento = None
+                vias = {}
             else:
                 progress_bar = st.progress(0)
                 status_text = st.empty()
                 
-                resultados = realizar_scraping(
-                    df_tienda, 
-                    TIENDAS_CONFIG[selected_store], 
-                    selected_store, 
-                    progress_bar, 
-                    status_text
-                )
+                def progreso(completados, total):
+                    progress_bar.progress(min(completados / total, 1.0))
+                    status_text.text(f"Escaneando {completados}/{total}...")
+                
+                cache = CacheHTTP(ttl_s=cache_ttl_horas * 3600, forzar=forzar_actualizacion) if usar_cache else None
+                historial = HistorialAuditorias()
+                
+                dfs_escanear, reusados = dict(dfs), {t: [] for t in dfs}
+                if modo_delta:
+                    for tienda, df_tienda in dfs.items():
+                        a_escanear, reusados[tienda] = historial.plan_delta(tienda, df_tienda, edad_max_horas * 3600)
+                        dfs_escanear[tienda] = df_tienda[a_escanear]
+                    st.info(f"🔁 Delta: {sum(map(len, dfs_escanear.values()))} para escanear, "
+                            f"{sum(map(len, reusados.values()))} tomados del historial")
+                
+                checkpoint = CheckpointAuditoria([(tienda, url) for tienda, df_tienda in dfs_escanear.items()
+                                                  for url in df_tienda['url']],
+                                                 reanudar=reanudar, vigencia_s=reanudar_horas * 3600)
+                if checkpoint.reanudada:
+                    st.info(f"♻️ Reanudando la auditoría interrumpida hace {checkpoint.edad_h:.1f} h: "
+                            f"las URLs ya resueltas no se vuelven a escanear")
+                try:
+                    # Todas las tiendas a la vez, cada una con sus límites (con una sola, es la de siempre)
+                    resultados = realizar_scraping_tiendas(
+                        dfs_escanear,
+                        progreso=progreso,
+                        cache=cache,
+                        checkpoint=checkpoint
+                    )
+                    checkpoint.finalizar()
+                    for tienda, resultados_tienda in resultados.items():
+                        historial.guardar(tienda, dfs[tienda], resultados_tienda)
+                finally:
+                    checkpoint.cerrar()
+                    historial.cerrar()
+                    if cache:
+                        cache.cerrar()
                 
                 progress_bar.empty()
                 status_text.empty()
+                ahorradas = sum(descargas_ahorradas(df_t['url']) for df_t in dfs_escanear.values())
+                df_rendimiento = tabla_rendimiento(resultados)
+                # Solo lo descargado ahora: lo reanudado del checkpoint o tomado del historial no usó navegador
+                vias = vias_resolucion(resultados)
             
-            for resultado in resultados:
-                idx = resultado['idx']
-                df_tienda.loc[idx, 'titulo'] = resultado.get('titulo')
-                df_tienda.loc[idx, 'precio_web'] = resultado.get('precio_web')
-                df_tienda.loc[idx, 'precio_tachado'] = resultado.get('precio_tachado')
-                df_tienda.loc[idx, 'descuento_%'] = resultado.get('descuento_%')
-                df_tienda.loc[idx, 'categoria'] = resultado.get('categoria')
-                df_tienda.loc[idx, 'cuotas'] = resultado.get('cuotas')
-                df_tienda.loc[idx, 'estado_producto'] = resultado.get('estado_producto')
-                df_tienda.loc[idx, 'estado_scraping'] = resultado.get('estado_scraping')
-            
-            # Calcular variación solo para activos con precio
-            mask = ((df_tienda['precio_web'].notna()) & (df_tienda['precio_maestro'].notna()) & 
-                    (df_tienda['precio_maestro'] > 0) & (df_tienda['estado_producto'] == 'Activo'))
-            
-            df_tienda['variacion_precio_%'] = None
-            if mask.any():
-                df_tienda.loc[mask, 'variacion_precio_%'] = ((df_tienda.loc[mask, 'precio_web'] - df_tienda.loc[mask, 'precio_maestro']) / 
-                                                               df_tienda.loc[mask, 'precio_maestro'] * 100).round(2)
-            
-            # Precio OK solo si hay precio Y está en rango
-            df_tienda['precio_ok'] = None
-            if mask.any():
-                df_tienda.loc[mask, 'precio_ok'] = abs(df_tienda.loc[mask, 'variacion_precio_%']) <= price_threshold
-            
-            # Cuotas OK solo si ambas existen
-            if selected_store in ["Fravega", "Megatone"] and 'cuotas_maestro' in df_tienda.columns:
-                mask_c = ((df_tienda['cuotas'].notna()) & (df_tienda['cuotas_maestro'].notna()) & 
-                          (df_tienda['estado_producto'] == 'Activo'))
-                df_tienda['cuotas_correctas'] = None
-                if mask_c.any():
-                    df_tienda.loc[mask_c, 'cuotas_correctas'] = (df_tienda.loc[mask_c, 'cuotas'] == df_tienda.loc[mask_c, 'cuotas_maestro'])
-            else:
-                df_tienda['cuotas_correctas'] = None
+            dfs_resultados = {
+                tienda: calcular_validaciones(combinar_resultados(df_tienda, resultados[tienda] + reusados[tienda]),
+                                              price_threshold, tienda in ["Fravega", "Megatone"])
+                for tienda, df_tienda in dfs.items()
+            }
+            df_tienda = combinar_tiendas(dfs_resultados) if todas_las_tiendas else dfs_resultados[selected_store]
             
             st.session_state.audit_results = df_tienda
+            st.session_state.audit_rendimiento = df_rendimiento
+            st.session_state.audit_id = f"{selected_store}-{time.time_ns()}"
             
             st.success(f"✅ Completado: {len(df_tienda)} productos")
             
@@ -790,6 +339,27 @@ with tab1:
             col2.metric("❌ Error precio", len(df_tienda[df_tienda['precio_ok'] == False]))
             col3.metric("⚠️ Inhabilitados", len(df_tienda[df_tienda['estado_producto'] == 'Inhabilitado']))
             col4.metric("🔴 Errores", len(df_tienda[df_tienda['estado_producto'] == 'Error']))
+            
+            if todas_las_tiendas:
+                st.dataframe(pd.DataFrame([
+                    {'Tienda': tienda, 'Productos': len(df_t),
+                     'Precio OK': (df_t['precio_ok'] == True).sum(), 'Error precio': (df_t['precio_ok'] == False).sum(),
+                     'Inhabilitados': (df_t['estado_producto'] == 'Inhabilitado').sum(),
+                     'Errores': (df_t['estado_producto'] == 'Error').sum()}
+                    for tienda, df_t in dfs_resultados.items()
+                ]), use_container_width=True, hide_index=True)
+            
+            if 'edad_h' in df_tienda.columns:
+                st.caption(f"🔁 Tomados del historial: {df_tienda['edad_h'].notna().sum()} "
+                           f"(hasta {df_tienda['edad_h'].max():.1f} h de antigüedad)")
+            
+            if ahorradas:
+                st.caption(f"🔗 URLs repetidas en el maestro: {ahorradas} descargas ahorradas "
+                           f"(cada página se escaneó una vez y su resultado se copió a todas sus filas)")
+            
+            if vias:
+                st.caption(f"⚡ Resueltos por HTTP: {vias.get('http', 0)} | "
+                           f"🌐 Con navegador: {vias.get('navegador', 0)}")
 
 with tab2:
     if st.session_state.audit_results is not None:
@@ -800,7 +370,7 @@ with tab2:
         col1, col2 = st.columns([3, 1])
         with col1:
             filtros = ["Todos", "Solo activos", "Errores precio", "Inhabilitados", "Errores técnicos"]
-            if selected_store in ["Fravega", "Megatone"]:
+            if con_cuotas:
                 filtros.append("Cuotas incorrectas")
             filtro = st.selectbox("Filtrar:", filtros)
         
@@ -820,23 +390,29 @@ with tab2:
         columnas_mostrar = ['sku', 'titulo', 'precio_maestro', 'precio_web', 'precio_tachado',
                            'descuento_%', 'variacion_precio_%', 'precio_ok', 'categoria', 'estado_producto', 'estado_scraping']
         
-        if selected_store in ["Fravega", "Megatone"]:
+        if con_cuotas:
             columnas_mostrar.insert(8, 'cuotas_maestro')
             columnas_mostrar.insert(9, 'cuotas')
             columnas_mostrar.insert(10, 'cuotas_correctas')
         
+        # Reporte combinado de todas las tiendas
+        columnas_mostrar.insert(0, 'tienda')
+        
+        # Auditoría delta: cuánto hace que se verificó lo tomado del historial
+        columnas_mostrar.append('edad_h')
+        
         columnas_existentes = [col for col in columnas_mostrar if col in df_mostrar.columns]
         df_display = df_mostrar[columnas_existentes].copy()
         
         # SIN GUIONES BAJOS
         nombres = {
-            'sku': 'SKU', 'titulo': 'Título', 'precio_maestro': 'Precio Maestro',
+            'tienda': 'Tienda', 'sku': 'SKU', 'titulo': 'Título', 'precio_maestro': 'Precio Maestro',
             'precio_web': 'Precio Web', 'precio_tachado': 'Precio Tachado',
             'descuento_%': 'Descuento %', 'variacion_precio_%': 'Variación %',
             'precio_ok': 'Precio OK', 'cuotas_maestro': 'Cuotas Maestro',
             'cuotas': 'Cuotas Web', 'cuotas_correctas': 'Cuotas OK',
             'categoria': 'Categoría', 'estado_producto': 'Estado',
-            'estado_scraping': 'Scraping'
+            'estado_scraping': 'Scraping', 'edad_h': 'Antigüedad (h)'
         }
         
         df_display = df_display.rename(columns=nombres)
@@ -851,31 +427,46 @@ with tab2:
         
         st.markdown("---")
         
-        col1, col2 = st.columns(2)
-        with col1:
-            excel_file = crear_excel_formateado(df_results, selected_store)
+        # Los archivos se generan recién al hacer clic (en otro hilo) y quedan cacheados para esta auditoría
+        audit_id = st.session_state.audit_id
+        fecha = datetime.now().strftime('%Y%m%d_%H%M')
+        
+        columnas_descarga = st.columns(3 if PARQUET_AVAILABLE else 2)
+        with columnas_descarga[0]:
             st.download_button(
                 "📊 Descargar Excel",
-                data=excel_file,
-                file_name=f"Auditoria_{selected_store}_{datetime.now().strftime('%Y%m%d_%H%M')}.xlsx",
+                data=lambda: exportacion_cacheada(audit_id, selected_store, 'xlsx', 'Todos', df_results),
+                file_name=f"Auditoria_{selected_store}_{fecha}.xlsx",
                 mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
                 use_container_width=True
             )
         
-        with col2:
-            csv = df_mostrar.to_csv(index=False)
+        with columnas_descarga[1]:
             st.download_button(
                 "📄 Descargar CSV",
-                data=csv,
-                file_name=f"Auditoria_{selected_store}_{datetime.now().strftime('%Y%m%d_%H%M')}.csv",
+                data=lambda: exportacion_cacheada(audit_id, selected_store, 'csv', filtro, df_mostrar),
+                file_name=f"Auditoria_{selected_store}_{fecha}.csv",
                 mime="text/csv",
                 use_container_width=True
             )
+        
+        if PARQUET_AVAILABLE:
+            with columnas_descarga[2]:
+                st.download_button(
+                    "🗃️ Descargar Parquet",
+                    data=lambda: exportacion_cacheada(audit_id, selected_store, 'parquet', filtro, df_mostrar),
+                    file_name=f"Auditoria_{selected_store}_{fecha}.parquet",
+                    mime="application/vnd.apache.parquet",
+                    use_container_width=True
+                )
     else:
         st.info("Ejecuta una auditoría primero")
 
 with tab3:
     if st.session_state.audit_results is not None:
+        # Plotly solo se carga cuando hay algo que graficar
+        import plotly.express as px
+        
         df = st.session_state.audit_results
         
         st.markdown("### 📈 Dashboard")
@@ -931,7 +522,18 @@ with tab3:
             else:
                 st.info("Sin datos de precios")
         
-        if selected_store in ["Fravega", "Megatone"] and 'cuotas' in df.columns:
+        if 'tienda' in df.columns:
+            st.markdown("---")
+            por_tienda = df.groupby('tienda', sort=False).agg(
+                ok=('precio_ok', lambda s: (s == True).sum()),
+                error=('precio_ok', lambda s: (s == False).sum()),
+                sin_validar=('precio_ok', lambda s: s.isna().sum())
+            ).reset_index()
+            fig = px.bar(por_tienda, x='tienda', y=['ok', 'error', 'sin_validar'], title='Precios por Tienda',
+                         labels={'tienda': 'Tienda', 'value': 'Productos', 'variable': 'Precio'})
+            st.plotly_chart(fig, use_container_width=True)
+        
+        if con_cuotas and 'cuotas' in df.columns:
             st.markdown("---")
             st.markdown("### 💳 Análisis de Cuotas")
             
@@ -954,6 +556,57 @@ with tab3:
                     fig = px.pie(values=[cuotas_ok, cuotas_error], names=['✅ Correctas', '❌ Incorrectas'],
                                title='Validación de Cuotas')
                     st.plotly_chart(fig, use_container_width=True)
+        
+        df_rendimiento = st.session_state.audit_rendimiento
+        if df_rendimiento is not None and not df_rendimiento.empty:
+            st.markdown("---")
+            st.markdown("### ⏱️ Rendimiento de la auditoría")
+            
+            resumen = resumen_rendimiento(df_rendimiento)
+            col1, col2, col3, col4 = st.columns(4)
+            col1.metric("🌐 URLs descargadas", resumen['urls'])
+            col2.metric("⏱️ Duración", f"{resumen['duracion_s']:.1f} s")
+            col3.metric("🚀 Throughput", f"{resumen['urls_por_s']:.1f} URLs/s")
+            col4.metric("📦 Transferido", f"{df_rendimiento['bytes'].sum() / 1024 / 1024:.1f} MB")
+            
+            st.dataframe(pd.DataFrame([
+                {'Tienda': tienda, 'URLs': datos['urls'], 'Desde cache': datos['desde_cache'],
+                 **{p.upper() + ' (ms)': v for p, v in (datos['latencia_ms'] or {}).items()}}
+                for tienda, datos in resumen['tiendas'].items()
+            ]), use_container_width=True, hide_index=True)
+            
+            col1, col2 = st.columns(2)
+            
+            with col1:
+                # Dónde se va el tiempo: promedio de cada fase por URL
+                fases = df_rendimiento.groupby('tienda')[[f'{fase}_ms' for fase in FASES_URL]].mean().reset_index()
+                fases = fases.melt(id_vars='tienda', var_name='fase', value_name='ms').dropna()
+                fases['fase'] = fases['fase'].str.removesuffix('_ms')
+                fig = px.bar(fases, x='tienda', y='ms', color='fase', title='Tiempo promedio por fase (ms)',
+                             labels={'tienda': 'Tienda', 'ms': 'ms', 'fase': 'Fase'})
+                st.plotly_chart(fig, use_container_width=True)
+            
+            with col2:
+                throughput = throughput_rendimiento(df_rendimiento)
+                fig = px.line(throughput, x='segundo', y='urls_por_s', color='tienda', markers=True,
+                              title='Throughput en el tiempo',
+                              labels={'segundo': 'Segundos desde el inicio', 'urls_por_s': 'URLs/s', 'tienda': 'Tienda'})
+                st.plotly_chart(fig, use_container_width=True)
+            
+            st.markdown("#### 🐢 URLs más lentas")
+            tiendas_rendimiento = list(resumen['tiendas'])
+            tienda_lentas = st.selectbox("Tienda:", tiendas_rendimiento) if len(tiendas_rendimiento) > 1 else tiendas_rendimiento[0]
+            lentas = df_rendimiento[df_rendimiento['tienda'] == tienda_lentas].nlargest(10, 'total_ms')
+            columnas_lentas = ['url', 'total_ms'] + [f'{fase}_ms' for fase in FASES_URL
+                                                     if lentas[f'{fase}_ms'].notna().any()] + ['bytes', 'estado_producto']
+            st.dataframe(lentas[columnas_lentas], use_container_width=True, hide_index=True)
+            
+            st.download_button(
+                "📡 Exportar métricas (JSON)",
+                data=lambda: exportar_rendimiento(df_rendimiento),
+                file_name=f"Rendimiento_{selected_store}_{datetime.now().strftime('%Y%m%d_%H%M')}.json",
+                mime="application/json"
+            )
     else:
         st.info("Ejecuta una auditoría primero")
 
@@ -0,0 +1,105 @@
+"""normalizar_precios (vectorizada) tiene que dar exactamente lo mismo que limpiar_precio celda a celda.
+
+    python -m pytest tests
+"""
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+
+from auditor import limpiar_precio, normalizar_precios  # noqa: E402
+
+
+def esperado(valores):
+    return pd.Series([limpiar_precio(v) for v in valores], dtype=float)
+
+
+def assert_equivalente(serie):
+    obtenido = normalizar_precios(serie)
+    referencia = esperado(list(serie))
+    assert list(obtenido.index) == list(serie.index)
+    pd.testing.assert_series_equal(obtenido.reset_index(drop=True), referencia, check_names=False)
+
+
+MILES = ['1.234', '$1.234.567', '1,234', '1,234,567', '12 345', '1.234.567,89', '12.345.6', '1.2.3']
+DECIMALES = ['12,50', '0,00', '1.234,5', '1.234,56', ',50', '1,', '12.50', '12.5', '.5', '1.', '12,345.67']
+PESOS = ['$ 1.234,56', '$ 999', '  $ 12 345 ', '$ 1.299.999,00 ', 'US$ 1.500', '$', '\t1.500\n']
+BLANCOS = ['', '   ', None, np.nan, pd.NA, 'Consultar', 'abc', '-1.500', '0', '٣٠٠', '1e5']
+NUMEROS = [0, -5, 15000, 15000.0, 1234.5, 1234.56, 0.1 + 0.2, 1e20, -0.0, -1234.5, 1e-5, 0.005, 12.345,
+           2.5e13, 1e16, float('inf'), np.float32(1.5), np.int64(7), True, False]
+
+
+@pytest.mark.parametrize('valores', [MILES, DECIMALES, PESOS, BLANCOS],
+                         ids=['miles', 'coma_decimal', 'pesos', 'blancos_nan'])
+def test_textos_object(valores):
+    assert_equivalente(pd.Series(valores, dtype=object))
+
+
+@pytest.mark.parametrize('valores', [MILES, DECIMALES, PESOS], ids=['miles', 'coma_decimal', 'pesos'])
+def test_textos_columna_string(valores):
+    # Columna de texto de pandas (pyarrow/str), con nulos
+    assert_equivalente(pd.Series(valores + [None], dtype='string'))
+
+
+def test_numeros_mezclados_object():
+    assert_equivalente(pd.Series(NUMEROS, dtype=object))
+
+
+def test_columna_mixta_excel():
+    # Excel: números, textos con formato, "Consultar" y celdas vacías en la misma columna
+    valores = MILES + NUMEROS + DECIMALES + PESOS + BLANCOS
+    assert_equivalente(pd.Series(valores, dtype=object))
+
+
+def test_columna_float_con_nan():
+    assert_equivalente(pd.Series([1500.0, 1234.56, np.nan, 0.0, -3.0, 12.345, 1e16, 2.5]))
+
+
+def test_columna_entera():
+    assert_equivalente(pd.Series([0, -5, 7, 15000, 3_000_000], dtype='int64'))
+
+
+def test_columna_booleana():
+    assert_equivalente(pd.Series([True, False, True]))
+
+
+def test_indice_conservado():
+    serie = pd.Series(['$ 1.500', None, '12,50'], index=[10, 20, 30], dtype=object)
+    assert list(normalizar_precios(serie).index) == [10, 20, 30]
+
+
+@pytest.mark.parametrize('texto, valor', [
+    ('$ 1.234,56', 1234.56),
+    ('$1.234.567', 1234567.0),
+    ('12,50', 12.5),
+    ('1,234', 1234.0),
+    ('12.50', 12.5),
+    ('', None),
+    ('Consultar', None),
+])
+def test_formatos_argentinos(texto, valor):
+    # Ancla de los casos frecuentes: no solo iguales entre sí, también el valor correcto
+    resultado = normalizar_precios(pd.Series([texto], dtype=object))[0]
+    assert (np.isnan(resultado) if valor is None else resultado == valor)
+    assert limpiar_precio(texto) == valor
+
+
+def test_corpus_aleatorio():
+    rnd = np.random.default_rng(0)
+    formatos = [
+        lambda v: v,
+        lambda v: float(v),
+        lambda v: f'$ {v:,}'.replace(',', '.'),
+        lambda v: f'{v:,.2f}'.replace(',', 'X').replace('.', ',').replace('X', '.'),
+        lambda v: f'{v / 100:.2f}',
+        lambda v: f'{v},00',
+        lambda v: '',
+        lambda v: None,
+    ]
+    valores = [formatos[rnd.integers(len(formatos))](int(rnd.integers(1, 3_000_000))) for _ in range(5_000)]
+    assert_equivalente(pd.Series(valores, dtype=object))